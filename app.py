@@ -1,164 +1,2041 @@
-from flask import Flask, request, jsonify, render_template
-import requests
-from bs4 import BeautifulSoup
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from bs4 import BeautifulSoup, Tag
+from bs4.builder import HTMLTreeBuilder
 import os
 import re
 import json
+import requests
 from werkzeug.utils import secure_filename
-from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 import subprocess
 import uuid
+import atexit
+import asyncio
+import threading
+import queue
+import shutil
+import multiprocessing
+import sys
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import AsyncExitStack, asynccontextmanager
+import httpx
+import jinja2
+import hashlib
+import sqlite3
+import time
+import random
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
 from openai import OpenAI
-from typing import Dict, List, Optional, Any
+try:
+    import lxml
+except ImportError:  # Optional faster parser backend
+    lxml = None
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # Optional lexbor parser backend
+    LexborHTMLParser = None
+from typing import Dict, List, Optional, Any, Tuple, Iterator
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'generated_scripts'
 app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY', '')  # Set your OpenAI API key in environment
+app.config['OPENAI_BASE_URL'] = os.getenv('OPENAI_BASE_URL') or None  # Point at any OpenAI-compatible endpoint
+app.config['AI_BATCH_TOKEN_BUDGET'] = int(os.getenv('AI_BATCH_TOKEN_BUDGET', '6000'))  # Prompt tokens of element data per batched call
+app.config['AI_BATCH_MAX_OUTPUT_TOKENS'] = int(os.getenv('AI_BATCH_MAX_OUTPUT_TOKENS', '4000'))  # Completion tokens per batched call
+app.config['AI_BATCH_CONCURRENCY'] = int(os.getenv('AI_BATCH_CONCURRENCY', '4'))  # Batched calls in flight at once
+app.config['SUGGESTION_CACHE_SIZE'] = int(os.getenv('SUGGESTION_CACHE_SIZE', '5000'))  # In-memory LRU entries
+app.config['SUGGESTION_CACHE_TTL'] = int(os.getenv('SUGGESTION_CACHE_TTL', str(7 * 24 * 3600)))  # Seconds before a suggestion is refetched
+app.config['SUGGESTION_CACHE_PATH'] = os.getenv('SUGGESTION_CACHE_PATH', os.path.join('cache', 'suggestions.sqlite3'))  # Empty disables the disk tier
+app.config['SUGGESTION_CACHE_MAX_ROWS'] = int(os.getenv('SUGGESTION_CACHE_MAX_ROWS', '100000'))  # Disk tier size limit
+app.config['ELEMENT_RULES'] = {  # What the crawler treats as a testable element
+    'tags': ['input', 'button', 'a', 'form', 'select', 'textarea'],
+    'attributes': {
+        'role': ['button', 'checkbox', 'radio', 'tab', 'menuitem', 'switch'],
+        'data-testid': None,
+        'data-cy': None,
+        'data-test': None,
+        'data-automation-id': None,
+        'aria-label': None
+    }
+}
+app.config['HTML_PARSER'] = os.getenv('HTML_PARSER', 'html.parser')  # 'html.parser', 'lxml' or 'selectolax'; falls back to html.parser if that package is missing
+app.config['EXTRACTION_MODE'] = os.getenv('EXTRACTION_MODE', 'html')  # 'html' parses the rendered HTML in Python; 'browser' extracts elements inside the page
+app.config['LINT_TIMEOUT'] = float(os.getenv('LINT_TIMEOUT', '30'))  # Seconds to wait for the resident ESLint worker
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '4'))  # Single-page generation jobs running at once
+app.config['JOB_LONG_WORKERS'] = int(os.getenv('JOB_LONG_WORKERS', '2'))  # Site and batch jobs running at once, in their own lane
+app.config['JOB_MAX_ACTIVE'] = int(os.getenv('JOB_MAX_ACTIVE', '32'))  # Queued plus running jobs per lane before new ones are refused
+app.config['JOB_RESULT_TTL'] = int(os.getenv('JOB_RESULT_TTL', '3600'))  # Seconds a finished job's result is kept
+app.config['BROWSER_POOL_SIZE'] = int(os.getenv('BROWSER_POOL_SIZE', '2'))  # Warm Chromium instances kept by the app
+app.config['BROWSER_MAX_PAGES'] = int(os.getenv('BROWSER_MAX_PAGES', '50'))  # Recycle a browser after this many pages
+app.config['BROWSER_MAX_MEMORY_MB'] = int(os.getenv('BROWSER_MAX_MEMORY_MB', '1024'))  # Recycle a browser above this RSS (0 disables)
+app.config['BROWSER_MEMORY_CHECK_PAGES'] = int(os.getenv('BROWSER_MEMORY_CHECK_PAGES', '10'))  # Sample a browser's RSS every this many pages
+app.config['CRAWL_CONCURRENCY'] = int(os.getenv('CRAWL_CONCURRENCY', '8'))  # Pages loaded at once by the crawl engine
+app.config['READINESS_STRATEGY'] = os.getenv('READINESS_STRATEGY', 'dom_stable')  # networkidle, dom_stable, selector, livewire or fixed
+app.config['READINESS_QUIET_MS'] = int(os.getenv('READINESS_QUIET_MS', '500'))  # DOM/Livewire quiet window that counts as settled
+app.config['READINESS_FIXED_MS'] = int(os.getenv('READINESS_FIXED_MS', '2000'))  # Wait budget for the fixed strategy
+app.config['CRAWL_DEADLINE_MS'] = int(os.getenv('CRAWL_DEADLINE_MS', '30000'))  # Hard limit on one crawl, retries included
+app.config['CRAWL_MAX_ATTEMPTS'] = int(os.getenv('CRAWL_MAX_ATTEMPTS', '3'))  # Page load attempts per crawl
+app.config['RETRY_BASE_DELAY_MS'] = int(os.getenv('RETRY_BASE_DELAY_MS', '500'))  # First retry backoff, doubled per attempt, with full jitter
+app.config['RETRY_MAX_DELAY_MS'] = int(os.getenv('RETRY_MAX_DELAY_MS', '8000'))  # Backoff ceiling
+app.config['CIRCUIT_FAILURE_THRESHOLD'] = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # Consecutive failed crawls (not attempts) before a host's circuit opens
+app.config['CIRCUIT_OPEN_SECONDS'] = int(os.getenv('CIRCUIT_OPEN_SECONDS', '60'))  # How long an open circuit fails fast before a trial crawl
+app.config['RESOURCE_BLOCKING'] = os.getenv('RESOURCE_BLOCKING', '1') == '1'  # Abort heavy and third-party subresources while crawling
+app.config['BLOCKED_RESOURCE_TYPES'] = [t for t in os.getenv('BLOCKED_RESOURCE_TYPES', 'image,media,font').split(',') if t]  # Playwright resource types never fetched
+app.config['BLOCKED_HOSTS'] = [h for h in os.getenv('BLOCKED_HOSTS', ','.join([  # Third-party hosts never fetched, subdomains included
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com', 'googleadservices.com',
+    'facebook.net', 'connect.facebook.com', 'hotjar.com', 'segment.io', 'segment.com', 'mixpanel.com', 'amplitude.com',
+    'fullstory.com', 'intercom.io', 'clarity.ms', 'newrelic.com', 'nr-data.net', 'sentry.io', 'adnxs.com', 'criteo.com'
+])).split(',') if h]
+app.config['ALLOWED_HOSTS'] = [h for h in os.getenv('ALLOWED_HOSTS', '').split(',') if h]  # If set, only the page's own host and these load
+app.config['BATCH_MAX_URLS'] = int(os.getenv('BATCH_MAX_URLS', '200'))  # URLs accepted by one batch request
+app.config['BATCH_PROCESSES'] = int(os.getenv('BATCH_PROCESSES', '0'))  # Worker processes for batch extraction and generation (0 uses every core)
+app.config['SITE_MAX_DEPTH'] = int(os.getenv('SITE_MAX_DEPTH', '2'))  # Link hops followed from the start page in site mode
+app.config['SITE_MAX_PAGES'] = int(os.getenv('SITE_MAX_PAGES', '50'))  # Pages crawled per site before link following stops
+app.config['SITE_HOST_RATE'] = float(os.getenv('SITE_HOST_RATE', '2'))  # Page loads per second per host in site mode (0 disables)
+app.config['CRAWL_CACHE_SIZE'] = int(os.getenv('CRAWL_CACHE_SIZE', '100'))  # Crawled pages kept in memory
+app.config['CRAWL_CACHE_TTL'] = int(os.getenv('CRAWL_CACHE_TTL', '300'))  # Seconds a crawl result is reused (0 only coalesces)
+app.config['CRAWL_CACHE_PATH'] = os.getenv('CRAWL_CACHE_PATH', '')  # SQLite file for a disk tier; empty keeps crawls in memory only
+app.config['CRAWL_CACHE_MAX_ROWS'] = int(os.getenv('CRAWL_CACHE_MAX_ROWS', '1000'))  # Disk tier size limit
+app.config['FINGERPRINT_STORE_PATH'] = os.getenv('FINGERPRINT_STORE_PATH', os.path.join('cache', 'fingerprints.sqlite3'))  # Per-URL state for incremental runs; empty keeps it in memory
 
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-def get_ai_suggestions(element_data: Dict[str, Any], page_context: str) -> Dict[str, Any]:
-    """Get AI-powered suggestions for test strategies and assertions."""
-    try:
-        if not app.config['OPENAI_API_KEY']:
-            return {}
-            
-        client = OpenAI(api_key=app.config['OPENAI_API_KEY'])
-        prompt = f"""Given this web element data and page context, suggest optimal Cypress test strategies:
-        Element: {json.dumps(element_data)}
+_openai_client: Optional[OpenAI] = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client() -> Optional[OpenAI]:
+    """Return the shared, connection-pooled OpenAI client, or None without an API key."""
+    global _openai_client
+    if not app.config['OPENAI_API_KEY']:
+        return None
+    with _openai_client_lock:
+        if _openai_client is None:
+            concurrency = app.config['AI_BATCH_CONCURRENCY']
+            _openai_client = OpenAI(
+                api_key=app.config['OPENAI_API_KEY'],
+                base_url=app.config['OPENAI_BASE_URL'],
+                http_client=httpx.Client(
+                    limits=httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency),
+                    timeout=60.0
+                )
+            )
+        return _openai_client
+
+class TieredCache:
+    """LRU memory tier in front of an optional SQLite tier, both with TTL expiry.
+
+    Values must be JSON-serializable. The memory tier holds at most `max_entries`
+    items; the disk tier (skipped when `path` is empty) keeps at most `max_rows`
+    and drops the least recently used rows beyond that, checked every 100 writes.
+    Disk hits refresh their row's access time lazily, in batches of 100 or with
+    the next write, and `get_many`/`set_many` serve a whole page in one query
+    and one transaction.
+    """
+
+    SQL_BATCH = 500  # Keys per IN (...) query, under SQLite's bound-parameter limit
+
+    def __init__(self, name: str, max_entries: int, ttl: float, path: str = '', max_rows: int = 0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._memory: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._db.execute(f'CREATE INDEX IF NOT EXISTS {name}_accessed ON {name} (accessed_at)')
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """The live cached values of the given keys; misses are left out."""
+        now = time.time()
+        found: Dict[str, Any] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    if now - entry[0] <= self.ttl:
+                        self._memory.move_to_end(key)
+                        self.stats['memory_hits'] += 1
+                        found[key] = entry[1]
+                        continue
+                    del self._memory[key]
+                missing.append(key)
+            if self._db is not None and missing:
+                for start in range(0, len(missing), self.SQL_BATCH):
+                    batch = missing[start:start + self.SQL_BATCH]
+                    rows = self._db.execute(
+                        f'SELECT key, value, stored_at FROM {self.name} WHERE key IN ({", ".join("?" * len(batch))})', batch
+                    ).fetchall()
+                    for key, value, stored_at in rows:
+                        if now - stored_at <= self.ttl:
+                            found[key] = json.loads(value)
+                            self._remember(key, stored_at, found[key])
+                            self._touched[key] = now
+                            self.stats['disk_hits'] += 1
+                if len(self._touched) >= 100:
+                    self._flush_touched()
+                    self._db.commit()
+            self.stats['misses'] += sum(1 for key in missing if key not in found)
+        return found
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        """Store several values, writing them to disk in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, now, value)
+            if self._db is not None:
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO {self.name} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    [(key, json.dumps(value, default=_json_default), now, now) for key, value in items.items()]
+                )
+                self._flush_touched()
+                writes = self._writes
+                self._writes += len(items)
+                if self._writes // 100 > writes // 100:
+                    self._evict_disk(now)
+                self._db.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and sizes for monitoring."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+            if self._db is not None:
+                stats['disk_entries'] = self._db.execute(f'SELECT COUNT(*) FROM {self.name}').fetchone()[0]
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+            return stats
+
+    def _remember(self, key: str, stored_at: float, value: Any):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                f'UPDATE {self.name} SET accessed_at = ? WHERE key = ?',
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched = {}
+
+    def _evict_disk(self, now: float):
+        self._db.execute(f'DELETE FROM {self.name} WHERE stored_at < ?', (now - self.ttl,))
+        if self.max_rows:
+            self._db.execute(
+                f'DELETE FROM {self.name} WHERE key IN '
+                f'(SELECT key FROM {self.name} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_rows,)
+            )
+
+suggestion_cache = TieredCache(
+    'suggestions',
+    max_entries=app.config['SUGGESTION_CACHE_SIZE'],
+    ttl=app.config['SUGGESTION_CACHE_TTL'],
+    path=app.config['SUGGESTION_CACHE_PATH'],
+    max_rows=app.config['SUGGESTION_CACHE_MAX_ROWS']
+)
+
+def suggestion_fingerprint(element_data: Dict[str, Any], page_context: str) -> str:
+    """Stable cache key for an element dict (minus prior suggestions and layout) and its page context."""
+    element = {k: v for k, v in element_data.items() if k not in ('ai_suggestions', 'bounding_box')}
+    payload = json.dumps({'element': element, 'context': page_context}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+AI_TOKENS_PER_SUGGESTION = 300  # Expected completion tokens for one element's suggestions
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def _chunk_for_suggestions(elements: List[Dict[str, Any]]) -> List[List[int]]:
+    """Group element indices into chunks that fit the prompt and completion token budgets."""
+    prompt_budget = app.config['AI_BATCH_TOKEN_BUDGET']
+    max_per_chunk = max(1, app.config['AI_BATCH_MAX_OUTPUT_TOKENS'] // AI_TOKENS_PER_SUGGESTION)
+    chunks = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, element in enumerate(elements):
+        tokens = _estimate_tokens(json.dumps(element, default=_json_default))
+        if current and (current_tokens + tokens > prompt_budget or len(current) >= max_per_chunk):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _request_suggestion_chunk(client: OpenAI, chunk: List[Dict[str, Any]], page_context: str) -> List[Dict[str, Any]]:
+    """Ask for suggestions for a chunk of elements in one call; results follow chunk order."""
+    prompt = f"""Given these web elements and page context, suggest optimal Cypress test strategies for each element:
+        Elements: {json.dumps([{'index': i, 'element': element} for i, element in enumerate(chunk)], default=_json_default)}
         Page Context: {page_context}
         
-        Provide suggestions for:
+        For every element provide suggestions for:
         1. Best selectors to use
         2. Recommended assertions
         3. Potential edge cases to test
         4. Performance considerations
         
-        Return the response as a valid JSON object with these keys:
+        Return the response as a valid JSON object with a single key "results": an array
+        with one object per element, each with these keys:
+        - index: the element's index from the input
         - selectors: array of recommended selectors
         - assertions: array of recommended assertions
         - edge_cases: array of potential edge cases
         - performance: array of performance considerations
         """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            response_format={"type": "json_object"}
+
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=min(app.config['AI_BATCH_MAX_OUTPUT_TOKENS'], AI_TOKENS_PER_SUGGESTION * len(chunk)),
+        response_format={"type": "json_object"}
+    )
+
+    results: List[Dict[str, Any]] = [{} for _ in chunk]
+    if not response.choices or not response.choices[0].message or not response.choices[0].message.content:
+        return results
+    try:
+        payload = json.loads(response.choices[0].message.content)
+    except json.JSONDecodeError:
+        print("Failed to parse AI batch response as JSON")
+        return results
+
+    for item in payload.get('results', []) if isinstance(payload, dict) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get('index'))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(chunk):
+            results[index] = {k: v for k, v in item.items() if k != 'index'}
+    return results
+
+def get_ai_suggestions_batch(elements: List[Dict[str, Any]], page_context: str) -> List[Dict[str, Any]]:
+    """Get AI suggestions for many elements using a few concurrent, token-budgeted calls.
+
+    Returns one suggestions dict per element, in input order; elements whose chunk
+    failed or that the model skipped get an empty dict.
+    Cached suggestions are reused and only cache misses are sent to the model.
+    """
+    suggestions: List[Dict[str, Any]] = [{} for _ in elements]
+    client = get_openai_client()
+    if client is None or not elements:
+        return suggestions
+
+    # Serve repeated elements (headers, nav, footers) from the cache
+    keys = [suggestion_fingerprint(element, page_context) for element in elements]
+    cached = suggestion_cache.get_many(keys)
+    missing = []
+    for index, key in enumerate(keys):
+        if key in cached:
+            suggestions[index] = cached[key]
+        else:
+            missing.append(index)
+    if not missing:
+        return suggestions
+
+    chunks = [[missing[i] for i in chunk] for chunk in _chunk_for_suggestions([elements[i] for i in missing])]
+    fresh: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=app.config['AI_BATCH_CONCURRENCY']) as executor:
+        futures = {
+            executor.submit(_request_suggestion_chunk, client, [elements[i] for i in chunk], page_context): chunk
+            for chunk in chunks
+        }
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                for index, result in zip(chunk, future.result()):
+                    suggestions[index] = result
+                    if result:
+                        fresh[keys[index]] = result
+            except Exception as e:
+                print(f"AI suggestion error: {str(e)}")
+    suggestion_cache.set_many(fresh)
+    return suggestions
+
+def _process_rss_mb(pid: int) -> float:
+    """Read the resident set size of a process from /proc, in megabytes."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0.0
+
+class _PooledBrowser:
+    """A warm browser plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.active_contexts = 0
+        self.retiring = False
+
+class BrowserPool:
+    """Warm Chromium instances owned by the app, shared by every crawl on the engine loop.
+
+    Each crawl gets a fresh, isolated browser context. The pool's `size` browsers
+    are launched in the background as soon as it starts, and launches never hold
+    the pool's lock: a crawl shares the least busy running browser rather than
+    waiting for a new one, and only waits when none is running yet. Browsers are
+    health-checked before use and recycled after serving `max_pages` pages or when
+    their processes grow past `max_memory_mb`, sampled every `memory_check_pages`
+    pages outside the pool's lock; a retiring browser is closed once its last
+    context is, and a replacement is launched in the background.
+    """
+
+    def __init__(self, size: int, max_pages: int, max_memory_mb: int, memory_check_pages: int = 10):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.memory_check_pages = max(1, memory_check_pages)
+        self._playwright = None
+        self._browsers: List[_PooledBrowser] = []
+        self._launches: set = set()
+        self._lock: Optional[asyncio.Lock] = None
+        self._playwright_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        self._lock = asyncio.Lock()
+        self._playwright_lock = asyncio.Lock()
+        for _ in range(self.size):
+            self._start_launch()
+
+    async def close(self):
+        if self._launches:
+            await asyncio.gather(*self._launches, return_exceptions=True)
+        for pooled in list(self._browsers):
+            await self._close_browser(pooled)
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def context(self):
+        """Yield an isolated browser context from the least busy warm browser."""
+        pooled = await self._acquire()
+        try:
+            context = await pooled.browser.new_context(
+                viewport={'width': 1920, 'height': 1080},
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            )
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            await self._release(pooled)
+
+    async def _acquire(self) -> _PooledBrowser:
+        while True:
+            dead, chosen, launches = [], None, []
+            async with self._lock:
+                for pooled in list(self._browsers):
+                    if not pooled.retiring and not pooled.browser.is_connected():
+                        pooled.retiring = True
+                        if pooled.active_contexts == 0:
+                            self._browsers.remove(pooled)
+                            dead.append(pooled)
+                available = [b for b in self._browsers if not b.retiring]
+                if not any(b.active_contexts == 0 for b in available) and len(available) + len(self._launches) < self.size:
+                    self._start_launch()
+                if available:
+                    chosen = min(available, key=lambda b: b.active_contexts)
+                    chosen.active_contexts += 1
+                else:
+                    launches = list(self._launches)
+            for pooled in dead:
+                await self._close_browser(pooled)
+            if chosen is not None:
+                return chosen
+            # Nothing is running yet: wait for a launch, surfacing its error if it fails
+            done, _ = await asyncio.wait(launches, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    def _start_launch(self):
+        task = asyncio.ensure_future(self._launch())
+        self._launches.add(task)
+        task.add_done_callback(self._launch_done)
+
+    def _launch_done(self, task: asyncio.Task):
+        self._launches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Browser launch failed: {str(task.exception()).strip().splitlines()[0]}")
+
+    async def _launch(self):
+        async with self._playwright_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(headless=True)
+        async with self._lock:
+            self._browsers.append(_PooledBrowser(browser))
+
+    async def _release(self, pooled: _PooledBrowser):
+        async with self._lock:
+            pooled.active_contexts -= 1
+            pooled.pages_served += 1
+            sample_memory = bool(self.max_memory_mb) and not pooled.retiring \
+                and pooled.pages_served % self.memory_check_pages == 0
+        # The CDP round-trip and /proc reads happen unlocked; the lock is only taken again to retire the browser
+        over_memory = sample_memory and await self._memory_mb(pooled.browser) > self.max_memory_mb
+        closing = None
+        async with self._lock:
+            if not pooled.retiring and (over_memory or self._needs_recycle(pooled)):
+                pooled.retiring = True
+            if pooled.retiring:
+                if pooled.active_contexts == 0 and pooled in self._browsers:
+                    self._browsers.remove(pooled)
+                    closing = pooled
+                if len([b for b in self._browsers if not b.retiring]) + len(self._launches) < self.size:
+                    self._start_launch()
+        if closing is not None:
+            await self._close_browser(closing)
+
+    async def _memory_mb(self, browser) -> float:
+        """Sum the RSS of the browser's processes via the CDP SystemInfo domain."""
+        try:
+            session = await browser.new_browser_cdp_session()
+            try:
+                info = await session.send('SystemInfo.getProcessInfo')
+            finally:
+                await session.detach()
+            return sum(_process_rss_mb(proc['id']) for proc in info.get('processInfo', []))
+        except Exception:
+            return 0.0
+
+    def _needs_recycle(self, pooled: _PooledBrowser) -> bool:
+        if not pooled.browser.is_connected():
+            return True
+        return bool(self.max_pages) and pooled.pages_served >= self.max_pages
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"Browser close error: {str(e)}")
+
+# Rough transfer size per aborted request, by resource type, for reporting savings
+_ESTIMATED_RESOURCE_BYTES = {
+    'image': 45000, 'media': 500000, 'font': 35000, 'stylesheet': 20000, 'script': 30000,
+    'xhr': 5000, 'fetch': 5000, 'websocket': 0, 'eventsource': 2000, 'other': 5000
+}
+
+def _host_matches(host: str, patterns: List[str]) -> bool:
+    return any(host == pattern or host.endswith('.' + pattern) for pattern in patterns)
+
+class ResourcePolicy:
+    """Which subresource requests a crawl aborts: by resource type, by host blocklist, or off an allowlist.
+
+    The crawled page's own host is exempt from the host rules, documents are
+    never blocked by type, and main-frame navigations (the page itself and its
+    redirects) are never blocked at all.
+    """
+
+    def __init__(self, block_types: List[str], block_hosts: List[str], allow_hosts: List[str]):
+        self.block_types = set(block_types)
+        self.block_hosts = [h.lower() for h in block_hosts]
+        self.allow_hosts = [h.lower() for h in allow_hosts]
+
+    @classmethod
+    def resolve(cls, overrides: Optional[Dict[str, Any]] = None) -> Optional['ResourcePolicy']:
+        """Build the policy from the app defaults and a request's overrides; None when blocking is off."""
+        overrides = overrides or {}
+        if not overrides.get('enabled', app.config['RESOURCE_BLOCKING']):
+            return None
+        return cls(
+            overrides.get('block_types', app.config['BLOCKED_RESOURCE_TYPES']),
+            overrides.get('block_hosts', app.config['BLOCKED_HOSTS']),
+            overrides.get('allow_hosts', app.config['ALLOWED_HOSTS'])
         )
-        
-        if not response.choices or not response.choices[0].message:
-            return {}
-            
+
+    def block_reason(self, resource_type: str, url: str, page_host: str, main_frame: bool = False) -> Optional[str]:
+        """Why this request should be aborted, or None to let it through.
+
+        `main_frame` marks a navigation of the page's main frame, such as a
+        redirect from example.com to www.example.com.
+        """
+        if main_frame:
+            return None
+        if resource_type != 'document' and resource_type in self.block_types:
+            return f'type:{resource_type}'
+        host = (urlsplit(url).hostname or '').lower()
+        if not host or host == page_host:
+            return None
+        if _host_matches(host, self.block_hosts):
+            return 'blocked_host'
+        if self.allow_hosts and not _host_matches(host, self.allow_hosts):
+            return 'not_allowed_host'
+        return None
+
+class Readiness(ABC):
+    """When a freshly navigated page counts as ready to snapshot.
+
+    `prepare` runs before navigation; `wait` returns once the page is ready and
+    may raise a timeout, after which the crawl snapshots the page as it is.
+    """
+
+    name = ''
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+
+    def prepare(self, page):
+        pass
+
+    @abstractmethod
+    async def wait(self, page, timeout: float):
+        ...
+
+class NetworkIdleReadiness(Readiness):
+    """No network connections for 500 ms; never settles on pages that poll or stream."""
+
+    name = 'networkidle'
+
+    async def wait(self, page, timeout: float):
+        await page.wait_for_load_state('networkidle', timeout=timeout * 1000)
+
+_DOM_STABLE_SCRIPT = """([quietMs, timeoutMs]) => new Promise((resolve) => {
+  let quietTimer;
+  const finish = (stable) => { observer.disconnect(); clearTimeout(quietTimer); clearTimeout(capTimer); resolve(stable); };
+  const observer = new MutationObserver(() => {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(() => finish(true), quietMs);
+  });
+  observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+  quietTimer = setTimeout(() => finish(true), quietMs);
+  const capTimer = setTimeout(() => finish(false), timeoutMs);
+})"""
+
+class DomStableReadiness(Readiness):
+    """No DOM mutations for a quiet window, observed in the page with a MutationObserver."""
+
+    name = 'dom_stable'
+
+    async def wait(self, page, timeout: float):
+        stable = await page.evaluate(_DOM_STABLE_SCRIPT, [self.settings['quiet_ms'], int(timeout * 1000)])
+        if not stable:
+            raise PlaywrightTimeoutError('DOM did not settle before the crawl deadline')
+
+class SelectorReadiness(Readiness):
+    """A given selector is present in the DOM."""
+
+    name = 'selector'
+
+    async def wait(self, page, timeout: float):
+        await page.wait_for_selector(self.settings['selector'], state='attached', timeout=timeout * 1000)
+
+class LivewireReadiness(Readiness):
+    """No Livewire request in flight for a quiet window; plain pages settle after the window."""
+
+    name = 'livewire'
+
+    def prepare(self, page):
+        self.pending = 0
+        self.last_activity = asyncio.get_running_loop().time()
+
+        def started(request):
+            if 'livewire' in request.url.lower():
+                self.pending += 1
+                self.last_activity = asyncio.get_running_loop().time()
+
+        def finished(request):
+            if 'livewire' in request.url.lower():
+                self.pending = max(0, self.pending - 1)
+                self.last_activity = asyncio.get_running_loop().time()
+
+        page.on('request', started)
+        page.on('requestfinished', finished)
+        page.on('requestfailed', finished)
+
+    async def wait(self, page, timeout: float):
+        loop = asyncio.get_running_loop()
+        quiet = self.settings['quiet_ms'] / 1000
+        give_up = loop.time() + timeout
+        while self.pending or loop.time() - self.last_activity < quiet:
+            if loop.time() >= give_up:
+                raise PlaywrightTimeoutError('Livewire did not go idle before the crawl deadline')
+            await asyncio.sleep(0.05)
+
+class FixedReadiness(Readiness):
+    """A fixed time budget after DOMContentLoaded, for pages nothing else fits."""
+
+    name = 'fixed'
+
+    async def wait(self, page, timeout: float):
+        await asyncio.sleep(min(self.settings['budget_ms'] / 1000, timeout))
+
+READINESS_STRATEGIES = {cls.name: cls for cls in (
+    NetworkIdleReadiness, DomStableReadiness, SelectorReadiness, LivewireReadiness, FixedReadiness
+)}
+
+def resolve_readiness(overrides: Optional[Dict[str, Any]] = None) -> Readiness:
+    """Build the readiness strategy from the app defaults and a request's overrides."""
+    settings = {
+        'strategy': app.config['READINESS_STRATEGY'],
+        'quiet_ms': app.config['READINESS_QUIET_MS'],
+        'budget_ms': app.config['READINESS_FIXED_MS'],
+        **(overrides or {})
+    }
+    return READINESS_STRATEGIES[settings['strategy']](settings)
+
+EXTRACTION_MODES = ('html', 'browser')
+
+def extraction_mode(options: Optional[Dict[str, Any]] = None) -> str:
+    """The crawl's extraction mode: the request's 'extraction' option, else EXTRACTION_MODE."""
+    return (options or {}).get('extraction', app.config['EXTRACTION_MODE'])
+
+def crawl_deadline_seconds(options: Optional[Dict[str, Any]] = None) -> float:
+    readiness = (options or {}).get('readiness') or {}
+    return readiness.get('deadline_ms', app.config['CRAWL_DEADLINE_MS']) / 1000
+
+class CircuitBreaker:
+    """Per-host circuit breaker for crawls.
+
+    A host whose crawls fail `threshold` times in a row has its circuit opened:
+    crawls of it fail fast for `open_seconds`, after which one trial crawl is let
+    through (half-open). Its success closes the circuit; its failure reopens it.
+    Read from request threads as well as the engine loop, hence the lock.
+    """
+
+    def __init__(self, threshold: int, open_seconds: float):
+        self.threshold = max(1, threshold)
+        self.open_seconds = open_seconds
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> Optional[float]:
+        """None if a crawl of host may proceed, else the seconds until it may be tried again."""
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is None or circuit['state'] == 'closed':
+                return None
+            if circuit['state'] == 'open':
+                if now < circuit['open_until']:
+                    return circuit['open_until'] - now
+                circuit['state'] = 'half_open'
+            # One trial at a time; a trial that never reported back stops blocking after open_seconds
+            if now < circuit['trial_until']:
+                return circuit['trial_until'] - now
+            circuit['trial_until'] = now + self.open_seconds
+            return None
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def release_trial(self, host: str):
+        """Give back a half-open trial that never reached the host, so the next crawl may take it."""
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is not None and circuit['state'] == 'half_open':
+                circuit['trial_until'] = 0.0
+
+    def record_failure(self, host: str, error: str):
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._hosts.setdefault(host, {
+                'state': 'closed', 'failures': 0, 'open_until': 0.0, 'trial_until': 0.0,
+                'last_error': '', 'last_failure_at': 0.0
+            })
+            circuit['failures'] += 1
+            circuit['last_error'] = error
+            circuit['last_failure_at'] = time.time()
+            if circuit['state'] == 'half_open' or circuit['failures'] >= self.threshold:
+                circuit['state'] = 'open'
+                circuit['open_until'] = now + self.open_seconds
+                circuit['trial_until'] = 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Every host with recent failures, its circuit state and when it may be retried."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    'state': 'half_open' if circuit['state'] == 'open' and now >= circuit['open_until'] else circuit['state'],
+                    'consecutive_failures': circuit['failures'],
+                    'retry_in_seconds': round(max(0.0, circuit['open_until'] - now), 1) if circuit['state'] == 'open' else 0.0,
+                    'last_error': circuit['last_error'],
+                    'last_failure_at': circuit['last_failure_at']
+                }
+                for host, circuit in self._hosts.items()
+            }
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+    ceiling = min(app.config['RETRY_MAX_DELAY_MS'], app.config['RETRY_BASE_DELAY_MS'] * 2 ** attempt)
+    return random.uniform(0, ceiling) / 1000
+
+class HostUnavailableError(Exception):
+    """The host answered, but with a server error, so the page isn't worth extracting."""
+
+class CrawlEngine:
+    """asyncio crawl engine on Playwright's async API.
+
+    One background thread runs the event loop that owns the browser pool, so many
+    pages load concurrently from a single loop while Flask threads submit work and
+    block on the result. `concurrency` bounds how many pages are open at once.
+    """
+
+    def __init__(self, pool: BrowserPool, concurrency: int, host_rate: float = 0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.pool = pool
+        self.concurrency = max(1, concurrency)
+        self.host_limiter = HostRateLimiter(host_rate)
+        self.breaker = breaker or CircuitBreaker(
+            threshold=app.config['CIRCUIT_FAILURE_THRESHOLD'],
+            open_seconds=app.config['CIRCUIT_OPEN_SECONDS']
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the engine loop from any thread and return its result."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout=timeout)
+
+    def shutdown(self):
+        """Close every browser and stop the event loop."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._loop is None:
+                return
         try:
-            suggestions = response.choices[0].message.content
-            return json.loads(suggestions) if suggestions else {}
-        except json.JSONDecodeError:
-            print("Failed to parse AI response as JSON")
-            return {}
-            
+            asyncio.run_coroutine_threadsafe(self.pool.close(), self._loop).result(timeout=30)
+        except Exception as e:
+            print(f"Browser pool shutdown error: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Crawl engine has been shut down')
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(loop, ready), name='crawl-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        loop.run_until_complete(self.pool.start())
+        ready.set()
+        loop.run_forever()
+        loop.close()
+
+    async def load_html(self, url: str, options: Optional[Dict[str, Any]] = None,
+                        deadline: Optional[float] = None, context=None) -> Tuple[Any, Dict[str, str], Dict[str, Any]]:
+        """Load a page in a browser context and wait until it is ready.
+
+        Uses the given context, whose caller holds the load slot, or otherwise
+        waits for a slot and takes an isolated context from the pool.
+
+        Returns the rendered HTML (or, in 'browser' extraction mode, the output of
+        the in-page extraction script), the response's HTTP validators and the crawl's
+        stats: 'resources' counts requests let through and aborted under the
+        resource policy, with an estimate of the bytes the aborted ones would have
+        cost; 'readiness' records the strategy, how long it waited and whether it
+        gave up. Navigation must finish by `deadline` (event loop time); a
+        readiness wait that runs out just snapshots the page as it is.
+        """
+        options = options or {}
+        loop = asyncio.get_running_loop()
+        readiness = resolve_readiness(options.get('readiness'))
+        extraction = extraction_mode(options)
+        policy = ResourcePolicy.resolve(options.get('resource_policy'))
+        resources = {'requests_allowed': 0, 'requests_blocked': 0, 'estimated_bytes_saved': 0, 'blocked_by_reason': {}}
+        page_host = (urlsplit(url).hostname or '').lower()
+
+        async def route_request(route):
+            request = route.request
+            main_frame = request.is_navigation_request() and request.frame.parent_frame is None
+            reason = policy.block_reason(request.resource_type, request.url, page_host, main_frame)
+            if reason is None:
+                resources['requests_allowed'] += 1
+                await route.continue_()
+                return
+            resources['requests_blocked'] += 1
+            resources['estimated_bytes_saved'] += _ESTIMATED_RESOURCE_BYTES.get(request.resource_type, 5000)
+            resources['blocked_by_reason'][reason] = resources['blocked_by_reason'].get(reason, 0) + 1
+            await route.abort('blockedbyclient')
+
+        async def load(context, deadline: float):
+            page = await context.new_page()
+            try:
+                if policy is not None:
+                    await page.route('**/*', route_request)
+                readiness.prepare(page)
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise PlaywrightTimeoutError('Crawl deadline exceeded')
+                page.set_default_timeout(remaining * 1000)
+                response = await page.goto(url, wait_until='domcontentloaded')
+                headers = response.headers if response is not None else {}
+                status = response.status if response is not None else 0
+                if status >= 500:
+                    raise HostUnavailableError(f'HTTP {status} from {url}')
+
+                # Wait for dynamic content, snapshotting whatever is there at the deadline
+                started = loop.time()
+                timed_out = False
+                try:
+                    await readiness.wait(page, max(0.0, deadline - started))
+                except PlaywrightTimeoutError:
+                    timed_out = True
+                except PlaywrightError as e:
+                    # The page navigated mid-wait; take the snapshot of where it landed
+                    print(f"Readiness wait interrupted for {url}: {str(e)}")
+                ready = {'strategy': readiness.name, 'wait_ms': round((loop.time() - started) * 1000), 'timed_out': timed_out}
+
+                validators = {'etag': headers.get('etag', ''), 'last_modified': headers.get('last-modified', '')}
+                if extraction == 'browser':
+                    content = await page.evaluate(_BROWSER_EXTRACT_SCRIPT, _browser_extract_arguments())
+                else:
+                    content = await page.content()
+                return content, validators, {'status': status, 'resources': resources, 'readiness': ready}
+            finally:
+                await page.close()
+
+        if context is not None:
+            return await load(context, deadline if deadline is not None else loop.time() + crawl_deadline_seconds(options))
+        async with self._semaphore:
+            deadline = loop.time() + crawl_deadline_seconds(options)
+            async with self.pool.context() as context:
+                return await load(context, deadline)
+
+    async def crawl(self, url: str, with_suggestions: bool = True, limiter: Optional['HostRateLimiter'] = None,
+                    options: Optional[Dict[str, Any]] = None, extract: bool = True) -> Dict[str, Any]:
+        """Crawl one URL with retries, extracting elements off the event loop.
+
+        When a limiter is given every attempt waits for its turn at the URL's host.
+        `options` carries per-request crawl settings such as 'resource_policy',
+        'readiness' and 'extraction' overrides; the result's 'crawl' entry
+        reports what the load cost. With `extract=False` the page is returned
+        unextracted as {'url', 'content', 'extraction', 'validators', 'crawl'},
+        for extraction elsewhere.
+
+        Timeouts, network errors and 5xx responses are retried with jittered
+        exponential backoff in the same browser context, within the crawl's
+        deadline; a crawl whose attempts all fail counts once against the
+        host's circuit. The crawl holds one of
+        the engine's load slots from before its deadline starts until the page
+        is loaded, so crawls queued behind the concurrency limit neither use up
+        their deadline nor hold a browser context while they wait. The stats'
+        'load_ms' is the time spent loading, over all attempts. A host whose circuit is
+        open fails immediately without touching the browser; a browser that
+        fails to launch is reported as is and not counted against the host.
+        """
+        host = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        max_attempts = max(1, app.config['CRAWL_MAX_ATTEMPTS'])
+        last_error = None
+        load_seconds = 0.0
+
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(self._semaphore)
+            deadline = loop.time() + crawl_deadline_seconds(options)
+            context = None
+            retry_after = self.breaker.allow(host)
+            if retry_after is not None:
+                return {
+                    'error': f'{host} has been failing; not retrying it for another {retry_after:.0f}s',
+                    'elements': [],
+                    'circuit_open': True
+                }
+            for attempt in range(max_attempts):
+                if context is None or not context.browser.is_connected():
+                    # A browser that can't be launched says nothing about the host, so it isn't held against it
+                    try:
+                        context = await stack.enter_async_context(self.pool.context())
+                    except Exception as e:
+                        self.breaker.release_trial(host)
+                        return {'error': f'Browser unavailable: {str(e)}', 'elements': []}
+                try:
+                    if limiter is not None:
+                        await limiter.wait(url)
+                    load_started = loop.time()
+                    try:
+                        content, validators, crawl_stats = await self.load_html(url, options, deadline, context)
+                    finally:
+                        load_seconds += loop.time() - load_started
+                except (PlaywrightError, HostUnavailableError) as e:
+                    last_error = e
+                    delay = backoff_seconds(attempt)
+                    if attempt + 1 == max_attempts or loop.time() + delay >= deadline:
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception as e:
+                    self.breaker.release_trial(host)
+                    return {'error': str(e), 'elements': []}
+                self.breaker.record_success(host)
+                # Free the slot and the context before extraction, which doesn't need the browser
+                await stack.aclose()
+                crawl_stats = {**crawl_stats, 'attempts': attempt + 1, 'load_ms': round(load_seconds * 1000)}
+                if not extract:
+                    return {
+                        'url': url,
+                        'content': content,
+                        'extraction': extraction_mode(options),
+                        'validators': validators,
+                        'crawl': crawl_stats
+                    }
+                try:
+                    extractor = browser_page_data if extraction_mode(options) == 'browser' else extract_page_data
+                    url_data = await asyncio.to_thread(extractor, url, content, with_suggestions)
+                except Exception as e:
+                    return {'error': str(e), 'elements': []}
+                url_data['validators'] = validators
+                url_data['crawl'] = crawl_stats
+                return url_data
+
+        self.breaker.record_failure(host, str(last_error))
+        failed_stats = {'attempts': attempt + 1, 'load_ms': round(load_seconds * 1000)}
+        if isinstance(last_error, PlaywrightTimeoutError):
+            return {'error': 'Page load timeout after multiple retries', 'elements': [], 'crawl': failed_stats}
+        return {'error': str(last_error) if last_error else 'Failed to crawl website after retries', 'elements': [], 'crawl': failed_stats}
+
+    async def crawl_site(self, start_url: str, max_depth: int, max_pages: int, on_page=None,
+                         revalidate=None, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Breadth-first crawl of the same-origin links reachable from start_url.
+
+        `concurrency` workers take pages off a FIFO frontier, so up to that many load
+        at once while the host limiter keeps each host's request rate polite. At most
+        `max_pages` distinct normalized URLs are visited, none deeper than `max_depth`
+        links from the start. `on_page(url_data, depth)` runs in a worker thread for
+        every crawled page and its returned dict is merged into that page's record.
+        `revalidate(url)` may return {'record', 'links'} for a page known to be
+        unchanged, which is then reported and followed without loading it.
+        Records come back in discovery order.
+        """
+        start_url = normalize_url(start_url) or start_url
+        origin = urlsplit(start_url)[:2]
+        discovered = {start_url: 0}
+        frontier: asyncio.Queue = asyncio.Queue()
+        frontier.put_nowait((start_url, 0, None))
+        records = []
+
+        async def worker():
+            while True:
+                url, depth, parent = await frontier.get()
+                record = {'url': url, 'depth': depth, 'parent': parent}
+                try:
+                    reused = await asyncio.to_thread(revalidate, url) if revalidate is not None else None
+                    if reused is not None:
+                        record.update(reused['record'])
+                        links = reused['links']
+                    else:
+                        url_data = await self.crawl(url, with_suggestions=False, limiter=self.host_limiter, options=options)
+                        links = [] if 'error' in url_data else page_links(url_data)
+                    if depth < max_depth:
+                        for link in site_links(links, origin):
+                            if link not in discovered and len(discovered) < max_pages:
+                                discovered[link] = len(discovered)
+                                frontier.put_nowait((link, depth + 1, url))
+                    if reused is None:
+                        if 'error' in url_data:
+                            record['error'] = url_data['error']
+                        elif on_page is not None:
+                            record.update(await asyncio.to_thread(on_page, url_data, depth))
+                except Exception as e:
+                    # A page that fails anywhere (a store error, a malformed stored record) is reported, and the worker moves on
+                    record['error'] = str(e)
+                finally:
+                    records.append(record)
+                    frontier.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await frontier.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return sorted(records, key=lambda record: discovered[record['url']])
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart; a rate of 0 disables it.
+
+    Only used from the crawl engine's event loop, so slots are handed out without locking.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+_NON_PAGE_EXTENSIONS = ('.pdf', '.zip', '.gz', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico',
+                        '.css', '.js', '.json', '.xml', '.txt', '.csv', '.mp3', '.mp4', '.webm', '.woff', '.woff2')
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Resolve url against base and canonicalize it for dedup; None for non-HTTP links.
+
+    Lowercases scheme and host, drops default ports, fragments and user info,
+    collapses repeated slashes and sorts query parameters.
+    """
+    url = urljoin(base, url.strip()) if base else url.strip()
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    netloc = parts.netloc.rsplit('@', 1)[-1].lower()
+    default_port = ':80' if scheme == 'http' else ':443'
+    if netloc.endswith(default_port):
+        netloc = netloc[:-len(default_port)]
+    path = re.sub(r'/{2,}', '/', parts.path) or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+def page_links(url_data: Dict[str, Any]) -> List[str]:
+    """The distinct normalized HTTP links of a crawled page's anchor elements, in document order."""
+    links = {}
+    for element in url_data['elements']:
+        if element['tag'] == 'a' and element.get('href'):
+            link = normalize_url(element['href'], url_data['url'])
+            if link is not None:
+                links.setdefault(link, None)
+    return list(links)
+
+def site_links(links: List[str], origin: Tuple[str, str]) -> Iterator[str]:
+    """Yield the links that stay on origin and look like pages rather than assets."""
+    for link in links:
+        parts = urlsplit(link)
+        if parts[:2] == origin and not parts.path.lower().endswith(_NON_PAGE_EXTENSIONS):
+            yield link
+
+crawl_engine = CrawlEngine(
+    BrowserPool(
+        size=app.config['BROWSER_POOL_SIZE'],
+        max_pages=app.config['BROWSER_MAX_PAGES'],
+        max_memory_mb=app.config['BROWSER_MAX_MEMORY_MB'],
+        memory_check_pages=app.config['BROWSER_MEMORY_CHECK_PAGES']
+    ),
+    concurrency=app.config['CRAWL_CONCURRENCY'],
+    host_rate=app.config['SITE_HOST_RATE'],
+    breaker=CircuitBreaker(
+        threshold=app.config['CIRCUIT_FAILURE_THRESHOLD'],
+        open_seconds=app.config['CIRCUIT_OPEN_SECONDS']
+    )
+)
+atexit.register(crawl_engine.shutdown)
+
+def collect_interactive_elements(soup: BeautifulSoup, rules: Optional[Dict[str, Any]] = None) -> List[Tag]:
+    """Return every element matching the rules once, in document order, from a single traversal.
+
+    `rules['tags']` lists tag names that are always collected; `rules['attributes']`
+    maps attribute names to the accepted values, or None to accept any value.
+    """
+    rules = rules or app.config['ELEMENT_RULES']
+    tag_names = set(rules.get('tags', []))
+    attr_rules = {
+        name: None if values is None else set(values)
+        for name, values in rules.get('attributes', {}).items()
+    }
+    collected = []
+    for element in soup.find_all(True):
+        if element.name in tag_names:
+            collected.append(element)
+            continue
+        for name, value in element.attrs.items():
+            if name in attr_rules:
+                accepted = attr_rules[name]
+                values = value if isinstance(value, list) else [value]
+                if accepted is None or any(v in accepted for v in values):
+                    collected.append(element)
+                    break
+    return collected
+
+STRING_CONTAINERS = ('script', 'style', 'template')
+MULTI_VALUED_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+PRESERVE_WHITESPACE_TAGS = HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS
+_ASCII_SPACES = {ord(c): None for c in '\x20\x0a\x09\x0c\x0d'}
+
+class ParsedComment(str):
+    """Comment text: kept in `contents` but skipped by `strings`, like bs4's Comment."""
+
+class ParsedElement:
+    """The subset of bs4.Tag's API the extraction code uses, over a tree from a non-bs4 backend."""
+
+    __slots__ = ('name', 'attrs', 'contents', 'parent')
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional['ParsedElement']):
+        self.name = name
+        self.attrs = attrs
+        self.contents: List[Any] = []
+        self.parent = parent
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key: str) -> bool:
+        return key in self.attrs
+
+    def __getitem__(self, key: str) -> Any:
+        return self.attrs[key]
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def __bool__(self) -> bool:
+        # Like bs4, an element is truthy even without contents
+        return True
+
+    def __eq__(self, other) -> bool:
+        # Structural equality, as bs4 defines it for Tag
+        if self is other:
+            return True
+        if (not isinstance(other, ParsedElement) or self.name != other.name
+                or self.attrs != other.attrs or len(self.contents) != len(other.contents)):
+            return False
+        return all(mine == theirs for mine, theirs in zip(self.contents, other.contents))
+
+    __hash__ = object.__hash__
+
+    @property
+    def parents(self):
+        parent = self.parent
+        while parent is not None:
+            yield parent
+            parent = parent.parent
+
+    @property
+    def descendants(self):
+        stack = list(reversed(self.contents))
+        while stack:
+            node = stack.pop()
+            yield node
+            if isinstance(node, ParsedElement):
+                stack.extend(reversed(node.contents))
+
+    @property
+    def strings(self):
+        """Text nodes in document order, skipping comments and other string containers' text."""
+        own = self.name if self.name in STRING_CONTAINERS else None
+        inherited = next((n.name for n in [self, *self.parents] if n.name in STRING_CONTAINERS), None)
+        stack = [(node, inherited) for node in reversed(self.contents)]
+        while stack:
+            node, container = stack.pop()
+            if isinstance(node, ParsedElement):
+                if node.name in STRING_CONTAINERS:
+                    container = node.name
+                stack.extend((child, container) for child in reversed(node.contents))
+            elif not isinstance(node, ParsedComment) and container == own:
+                yield node
+
+    @property
+    def string(self) -> Optional[str]:
+        if len(self.contents) != 1:
+            return None
+        child = self.contents[0]
+        if isinstance(child, ParsedElement):
+            return child.string
+        return child
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        strings = (s.strip() for s in self.strings) if strip else self.strings
+        return separator.join(s for s in strings if s or not strip)
+
+    def _matches(self, name, attrs: Optional[Dict[str, Any]]) -> bool:
+        if name is not True and name is not None:
+            if isinstance(name, str):
+                if self.name != name:
+                    return False
+            elif self.name not in name:
+                return False
+        if attrs:
+            return all(self.attrs.get(k) == v for k, v in attrs.items())
+        return True
+
+    def find_all(self, name=None, attrs: Optional[Dict[str, Any]] = None, recursive: bool = True) -> List['ParsedElement']:
+        nodes = self.descendants if recursive else self.contents
+        return [node for node in nodes if isinstance(node, ParsedElement) and node._matches(name, attrs)]
+
+    def find(self, name=None, attrs: Optional[Dict[str, Any]] = None) -> Optional['ParsedElement']:
+        return next((node for node in self.descendants
+                     if isinstance(node, ParsedElement) and node._matches(name, attrs)), None)
+
+    def find_parent(self, name=None) -> Optional['ParsedElement']:
+        return next((parent for parent in self.parents if parent._matches(name, None)), None)
+
+class ParsedDocument(ParsedElement):
+    """Root of a selectolax/lexbor-parsed page, answering CSS queries with lexbor itself."""
+
+    __slots__ = ('_tree', '_by_mem_id')
+
+    def __init__(self, tree):
+        super().__init__('[document]', {}, None)
+        self._tree = tree
+        self._by_mem_id: Dict[int, ParsedElement] = {}
+
+    @property
+    def title(self) -> Optional[ParsedElement]:
+        return self.find('title')
+
+    def select(self, selector: str) -> List[ParsedElement]:
+        return [self._by_mem_id[node.mem_id] for node in self._tree.css(selector) if node.mem_id in self._by_mem_id]
+
+def _lexbor_attrs(node) -> Dict[str, Any]:
+    """Attributes as bs4 reports them: valueless ones as '' and multi-valued ones as lists."""
+    attrs = {k: '' if v is None else v for k, v in node.attributes.items()}
+    for key in MULTI_VALUED_ATTRIBUTES.get('*', []) + MULTI_VALUED_ATTRIBUTES.get(node.tag, []):
+        if key in attrs:
+            attrs[key] = attrs[key].split()
+    return attrs
+
+def _parse_with_lexbor(html: str) -> ParsedDocument:
+    tree = LexborHTMLParser(html)
+    document = ParsedDocument(tree)
+    if tree.root is None:
+        return document
+    root = ParsedElement(tree.root.tag, _lexbor_attrs(tree.root), document)
+    document.contents.append(root)
+    document._by_mem_id[tree.root.mem_id] = root
+    stack = [(tree.root, root, False)]
+    while stack:
+        node, element, preserve_whitespace = stack.pop()
+        child = node.child
+        while child is not None:
+            if child.is_element_node:
+                child_element = ParsedElement(child.tag, _lexbor_attrs(child), element)
+                element.contents.append(child_element)
+                document._by_mem_id[child.mem_id] = child_element
+                stack.append((child, child_element, preserve_whitespace or child.tag in PRESERVE_WHITESPACE_TAGS))
+            elif child.is_text_node:
+                text = child.text_content
+                # bs4 collapses whitespace-only strings outside <pre> and <textarea>
+                if not preserve_whitespace and not text.translate(_ASCII_SPACES):
+                    text = '\n' if '\n' in text else ' '
+                element.contents.append(text)
+            elif child.is_comment_node:
+                element.contents.append(ParsedComment(child.comment_content or ''))
+            child = child.next
+    return document
+
+def parse_html(html: str, backend: Optional[str] = None):
+    """Parse HTML with the configured backend: 'html.parser', 'lxml' or 'selectolax'.
+
+    bs4-backed parsers return a BeautifulSoup tree; 'selectolax' returns a
+    ParsedDocument exposing the same API subset. Unavailable backends fall back
+    to 'html.parser'.
+    """
+    backend = backend or app.config['HTML_PARSER']
+    if backend == 'selectolax':
+        if LexborHTMLParser is not None:
+            return _parse_with_lexbor(html)
+        print("selectolax is not installed, falling back to html.parser")
+        backend = 'html.parser'
+    if backend == 'lxml' and lxml is None:
+        print("lxml is not installed, falling back to html.parser")
+        backend = 'html.parser'
+    return BeautifulSoup(html, backend)
+
+class PageSnapshot:
+    """The rendered HTML of a crawled page and its parsed DOM, shared by every later stage.
+
+    Pages extracted in the browser have neither; their index is a BrowserIndex.
+    """
+
+    def __init__(self, html: Optional[str], soup: Optional[BeautifulSoup], index: 'DocumentIndex'):
+        self.html = html
+        self.soup = soup
+        self.index = index
+
+def extract_page_data(url: str, html: str, with_suggestions: bool = True) -> Dict[str, Any]:
+    """Parse rendered HTML and extract page metadata and interactive elements.
+
+    With `with_suggestions=False` the AI step is skipped; call attach_ai_suggestions later.
+    """
+    soup = parse_html(html)
+    index = DocumentIndex(soup)
+
+    # Get page metadata
+    page_title = soup.title.string if soup.title else "Unknown Page"
+    if page_title is not None:
+        # A NavigableString would keep the whole tree alive, and can't be pickled to batch workers
+        page_title = str(page_title)
+    meta_description = soup.find('meta', {'name': 'description'})
+    description = meta_description['content'] if meta_description else ""
+
+    # Extract elements with enhanced data
+    elements = [extract_element_data(element, soup, index) for element in collect_interactive_elements(soup)]
+
+    url_data = {
+        'elements': elements,
+        'page_title': page_title,
+        'description': description,
+        'url': url,
+        'snapshot': PageSnapshot(html, soup, index)
+    }
+    if with_suggestions:
+        attach_ai_suggestions(url_data)
+    return url_data
+
+def attach_ai_suggestions(url_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Fetch AI suggestions for a crawled page's elements and store them on each element."""
+    page_context = f"Page: {url_data['page_title']}, Description: {url_data['description']}"
+    suggestions = get_ai_suggestions_batch(url_data['elements'], page_context)
+    for elem_data, ai_suggestions in zip(url_data['elements'], suggestions):
+        elem_data['ai_suggestions'] = ai_suggestions
+    return suggestions
+
+# Mirrors collect_interactive_elements and extract_element_data (including
+# bounded_text, DocumentIndex's label rules and get_xpath's numbering of
+# structurally equal siblings) against the live DOM, and adds what only the
+# browser knows: real visibility and layout.
+_BROWSER_EXTRACT_SCRIPT = """([rules, indexedAttributes, multiValued, limit]) => {
+  const tagNames = new Set(rules.tags || []);
+  const attributeRules = Object.entries(rules.attributes || {});
+  const stringContainers = new Set(['script', 'style', 'template']);
+  const isMultiValued = (tag, name) => (multiValued['*'] || []).includes(name) || (multiValued[tag] || []).includes(name);
+
+  function* strings(root) {
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+      acceptNode: (node) => node.nodeType === Node.TEXT_NODE ? NodeFilter.FILTER_ACCEPT
+        : stringContainers.has(node.localName) ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_SKIP
+    });
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) yield node.data;
+  }
+  const strippedText = (root) => Array.from(strings(root), (s) => s.trim()).filter(Boolean).join('').replace(/\\s+/g, ' ');
+  const boundedText = (root) => {
+    const parts = [];
+    let length = 0;
+    for (let string of strings(root)) {
+      if (!parts.length) {
+        string = string.trimStart();
+        if (!string) continue;
+      }
+      parts.push(string);
+      length += string.length;
+      if (length > limit && string.trim()) {
+        const text = parts.join('');
+        if (text.trimEnd().length > limit) return text.slice(0, limit).trim() + '...';
+      }
+    }
+    const text = parts.join('').trim();
+    return text.length > limit ? text.slice(0, limit).trim() + '...' : text;
+  };
+
+  const labelText = new Map();
+  const labelsFor = new Map();
+  for (const label of document.querySelectorAll('label')) {
+    labelText.set(label, strippedText(label));
+    const target = label.getAttribute('for');
+    if (target && !labelsFor.has(target)) labelsFor.set(target, labelText.get(label));
+  }
+  const labelFor = (el) => {
+    const id = el.getAttribute('id');
+    const text = id ? labelsFor.get(id) || '' : '';
+    if (text) return text;
+    const label = el.parentElement && el.parentElement.closest('label');
+    return label ? labelText.get(label) : '';
+  };
+
+  const siblingGroups = new Map();
+  const positions = new Map();
+  const step = (child, parent) => {
+    let groups = siblingGroups.get(parent);
+    if (!groups) {
+      groups = new Map();
+      for (const sibling of parent.children) {
+        if (!groups.has(sibling.localName)) groups.set(sibling.localName, []);
+        groups.get(sibling.localName).push(sibling);
+      }
+      siblingGroups.set(parent, groups);
+    }
+    const siblings = groups.get(child.localName);
+    if (siblings.length === 1) return child.localName;
+    if (!positions.has(child)) {
+      const first = new Map();
+      siblings.forEach((sibling, i) => {
+        const markup = sibling.outerHTML;
+        if (!first.has(markup)) first.set(markup, i + 1);
+        positions.set(sibling, first.get(markup));
+      });
+    }
+    return `${child.localName}[${positions.get(child)}]`;
+  };
+  const xpath = (el) => {
+    const components = [];
+    let child = el;
+    for (let parent = el.parentElement; parent && parent.localName !== 'html'; parent = parent.parentElement) {
+      components.push(step(child, parent));
+      child = parent;
+    }
+    return components.length ? '//' + components.reverse().join('/') : '//' + el.localName;
+  };
+
+  const isVisible = (el, rect) => rect.width > 0 && rect.height > 0
+    && (typeof el.checkVisibility !== 'function' || el.checkVisibility({ checkOpacity: true, checkVisibilityCSS: true }));
+  const matches = (el) => tagNames.has(el.localName) || attributeRules.some(([name, accepted]) => {
+    const value = el.getAttribute(name);
+    if (value === null) return false;
+    if (accepted === null) return true;
+    const values = isMultiValued(el.localName, name) ? value.split(/\\s+/).filter(Boolean) : [value];
+    return values.some((v) => accepted.includes(v));
+  });
+  const attr = (el, name) => el.getAttribute(name) ?? '';
+
+  const elements = [];
+  const index = [];
+  for (const el of document.querySelectorAll('*')) {
+    const tag = el.localName;
+    const indexed = {};
+    for (const name of indexedAttributes) {
+      const value = el.getAttribute(name);
+      if (value !== null && !isMultiValued(tag, name)) indexed[name] = value;
+    }
+    const collect = matches(el);
+    if (!collect && !Object.keys(indexed).length) continue;
+    const rect = el.getBoundingClientRect();
+    const visible = isVisible(el, rect);
+    if (Object.keys(indexed).length) index.push([tag, indexed, visible]);
+    if (!collect) continue;
+
+    const data = {
+      tag,
+      id: attr(el, 'id'),
+      class: attr(el, 'class').split(/\\s+/).filter(Boolean).join(' '),
+      type: attr(el, 'type'),
+      name: attr(el, 'name'),
+      placeholder: attr(el, 'placeholder'),
+      value: attr(el, 'value'),
+      href: attr(el, 'href'),
+      role: attr(el, 'role'),
+      'aria-label': attr(el, 'aria-label'),
+      'data-testid': attr(el, 'data-testid'),
+      'data-cy': attr(el, 'data-cy'),
+      'data-test': attr(el, 'data-test'),
+      'data-automation-id': attr(el, 'data-automation-id'),
+      text_content: ['input', 'textarea', 'select'].includes(tag) ? '' : boundedText(el).replace(/\\s+/g, ' '),
+      label: labelFor(el),
+      options: tag === 'select'
+        ? Array.from(el.querySelectorAll('option'), (opt) => ({ text: strippedText(opt), value: attr(opt, 'value') }))
+        : [],
+      visible,
+      xpath: xpath(el),
+      required: el.hasAttribute('required'),
+      bounding_box: {
+        x: Math.round(rect.left + window.scrollX),
+        y: Math.round(rect.top + window.scrollY),
+        width: Math.round(rect.width),
+        height: Math.round(rect.height)
+      }
+    };
+    for (const { name, value } of el.attributes) {
+      if (name.startsWith('wire:')) data[name] = value;
+    }
+    elements.push(data);
+  }
+
+  const title = document.querySelector('title');
+  const titleString = title && title.childNodes.length === 1 && title.firstChild.nodeType === Node.TEXT_NODE
+    ? title.firstChild.data : null;
+  const description = document.querySelector('meta[name="description"]');
+  return {
+    has_title: title !== null,
+    title: titleString,
+    description: description ? attr(description, 'content') : '',
+    elements,
+    index
+  };
+}"""
+
+def _browser_extract_arguments() -> List[Any]:
+    multi_valued = {tag: sorted(names) for tag, names in MULTI_VALUED_ATTRIBUTES.items()}
+    return [app.config['ELEMENT_RULES'], list(INDEXED_ATTRIBUTES), multi_valued, 50]
+
+def browser_page_data(url: str, extracted: Dict[str, Any], with_suggestions: bool = True) -> Dict[str, Any]:
+    """Build extract_page_data's result from the in-page extraction script's output.
+
+    Elements carry real 'visible' flags and a 'bounding_box'; the snapshot has no
+    HTML or soup, only a BrowserIndex for selector uniqueness checks.
+    """
+    url_data = {
+        'elements': [ElementRecord(element) for element in extracted['elements']],
+        'page_title': extracted['title'] if extracted['has_title'] else "Unknown Page",
+        'description': extracted['description'],
+        'url': url,
+        'snapshot': PageSnapshot(None, None, BrowserIndex(extracted['index']))
+    }
+    if with_suggestions:
+        attach_ai_suggestions(url_data)
+    return url_data
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution whose result they all share."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+crawl_cache = TieredCache(
+    'crawls',
+    max_entries=app.config['CRAWL_CACHE_SIZE'],
+    ttl=app.config['CRAWL_CACHE_TTL'],
+    path=app.config['CRAWL_CACHE_PATH'],
+    max_rows=app.config['CRAWL_CACHE_MAX_ROWS']
+)
+crawl_flight = SingleFlight()
+
+def crawl_cache_key(url: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Cache key for a crawl: the normalized URL plus whatever crawl options change its result."""
+    return json.dumps([normalize_url(url) or url, options or {}], sort_keys=True)
+
+def _page_data_from_cache(url: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild crawl_website's result from a cached entry, re-parsing the stored HTML.
+
+    Browser-extracted pages store their index entries instead of HTML.
+    """
+    if entry['html'] is None:
+        snapshot = PageSnapshot(None, None, BrowserIndex(entry['index']))
+    else:
+        soup = parse_html(entry['html'])
+        snapshot = PageSnapshot(entry['html'], soup, DocumentIndex(soup))
+    return {
+        'elements': [e if isinstance(e, ElementRecord) else ElementRecord(e) for e in entry['elements']],
+        'page_title': entry['page_title'],
+        'description': entry['description'],
+        'url': url,
+        'validators': entry['validators'],
+        'crawl': {**entry['crawl'], 'cached': True},
+        'snapshot': snapshot
+    }
+
+def _crawl_and_cache(url: str, key: str, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    cached = crawl_cache.get(key)
+    if cached is not None:
+        return _page_data_from_cache(url, cached)
+    url_data = crawl_engine.run(crawl_engine.crawl(url, with_suggestions=False, options=options))
+    if 'error' not in url_data:
+        snapshot = url_data['snapshot']
+        crawl_cache.set(key, {
+            'html': snapshot.html,
+            'index': snapshot.index.entries if snapshot.html is None else None,
+            'elements': url_data['elements'],
+            'page_title': url_data['page_title'],
+            'description': url_data['description'],
+            'validators': url_data.get('validators', {}),
+            'crawl': url_data.get('crawl', {})
+        })
+    return url_data
+
+def crawl_website(url: str, with_suggestions: bool = True, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Crawl website on the shared async engine with enhanced error handling and retries.
+
+    Results are cached for CRAWL_CACHE_TTL seconds, and concurrent requests for
+    the same page share one in-flight crawl. Each caller gets its own element
+    dicts, so attaching suggestions never leaks into the cache or other callers.
+    """
+    try:
+        key = crawl_cache_key(url, options)
+        url_data = crawl_flight.do(key, lambda: _crawl_and_cache(url, key, options))
+        url_data = {**url_data, 'url': url, 'elements': [element.copy() for element in url_data['elements']]}
+        if with_suggestions and 'error' not in url_data:
+            attach_ai_suggestions(url_data)
+        return url_data
     except Exception as e:
-        print(f"AI suggestion error: {str(e)}")
-        return {}
+        return {'error': str(e), 'elements': []}
+
+INDEXED_ATTRIBUTES = ('id', 'name', 'data-testid', 'data-cy', 'data-test', 'data-automation-id', 'aria-label', 'placeholder', 'wire:model')
+_SELECTOR_TAG = re.compile(r"[a-zA-Z][\w-]*|")
+_SELECTOR_PART = re.compile(r"#(-?[_a-zA-Z][\w-]*)|\[([\w-]+|wire\\\\:[\w.-]+)='((?:[^'\\]|\\')*)'\]")
+
+def _attrs_key(attrs: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in attrs.items()))
+
+class DocumentIndex:
+    """Per-document lookup tables built in one pass so per-element work avoids rescanning the tree."""
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self.xpaths: Dict[int, str] = {}
+        self._index_xpaths(soup)
+        self.attribute_values: Dict[Tuple[str, str], List[Tag]] = {}
+        for tag in soup.find_all(True):
+            for name in INDEXED_ATTRIBUTES:
+                value = tag.attrs.get(name)
+                if isinstance(value, str):
+                    self.attribute_values.setdefault((name, value), []).append(tag)
+        self.labels_for: Dict[str, str] = {}
+        self.ancestor_labels: Dict[int, str] = {}
+        for label in soup.find_all('label'):
+            label_text = re.sub(r'\s+', ' ', label.get_text(strip=True))
+            target = label.get('for')
+            if target and target not in self.labels_for:
+                self.labels_for[target] = label_text
+            # Labels come in document order, so nested labels overwrite their ancestors
+            for descendant in label.find_all(True):
+                self.ancestor_labels[id(descendant)] = label_text
+
+    def _index_xpaths(self, soup: BeautifulSoup):
+        """Compute get_xpath's result for every tag in two linear passes.
+
+        get_xpath numbers a node by `siblings.index(child)`, i.e. the first sibling of
+        the same name that is *structurally equal* to it. A bottom-up subtree hash
+        finds those equal siblings without comparing every pair.
+        """
+        tags = [soup] + soup.find_all(True)
+        subtree_hashes: Dict[int, int] = {}
+        for tag in reversed(tags):
+            subtree_hashes[id(tag)] = hash((
+                tag.name,
+                _attrs_key(tag.attrs),
+                tuple(hash(str(c)) if isinstance(c, str) else subtree_hashes[id(c)] for c in tag.contents)
+            ))
+
+        paths: Dict[int, str] = {id(soup): ''}
+        for parent in tags:
+            children = [c for c in parent.contents if not isinstance(c, str)]
+            if not children:
+                continue
+            groups: Dict[str, List[Tag]] = {}
+            for child in children:
+                groups.setdefault(child.name, []).append(child)
+            parent_path = paths[id(parent)]
+            for name, siblings in groups.items():
+                first_equal: Dict[int, List[Tuple[Tag, int]]] = {}
+                for position, child in enumerate(siblings, start=1):
+                    if len(siblings) == 1:
+                        step = name
+                    else:
+                        candidates = first_equal.setdefault(subtree_hashes[id(child)], [])
+                        index = next((pos for other, pos in candidates if other == child), None)
+                        if index is None:
+                            candidates.append((child, position))
+                            index = position
+                        step = f"{name}[{index}]"
+                    if parent.name == 'html':
+                        paths[id(child)] = ''
+                    else:
+                        paths[id(child)] = f"{parent_path}/{step}" if parent_path else step
+        for tag in tags[1:]:
+            path = paths[id(tag)]
+            self.xpaths[id(tag)] = f"//{path}" if path else f"//{tag.name}"
+
+    def xpath(self, element) -> str:
+        """get_xpath(element) in O(1), for elements of the indexed document."""
+        xpath = self.xpaths.get(id(element))
+        return xpath if xpath is not None else get_xpath(element)
+
+    def is_visible(self, tag) -> bool:
+        """Whether a tag counts towards a `:visible` match; parsed HTML can't tell, so every tag does."""
+        return True
+
+    def count_matches(self, selector: str) -> Optional[int]:
+        """Count matches for the selectors get_best_selector builds, or None if the index can't tell.
+
+        Handles an optional tag name followed by `#id` and `[attr='value']` parts on
+        indexed attributes, plus a trailing `:visible`, which only counts tags
+        is_visible accepts.
+        """
+        tag_match = _SELECTOR_TAG.match(selector)
+        tag_name = tag_match.group(0) or None
+        position = tag_match.end()
+        conditions: List[Tuple[str, str]] = []
+        visible_only = False
+        while position < len(selector):
+            if selector.startswith(':visible', position) and position + len(':visible') == len(selector):
+                visible_only = True
+                break
+            part = _SELECTOR_PART.match(selector, position)
+            if not part:
+                return None
+            if part.group(1) is not None:
+                conditions.append(('id', part.group(1)))
+            else:
+                name = part.group(2).replace('\\\\:', ':')
+                if name not in INDEXED_ATTRIBUTES:
+                    return None
+                conditions.append((name, part.group(3).replace("\\'", "'")))
+            position = part.end()
+        if not conditions:
+            return None
+
+        candidates = min((self.attribute_values.get(condition, []) for condition in conditions), key=len)
+        return sum(
+            1 for tag in candidates
+            if (tag_name is None or tag.name == tag_name)
+            and all(tag.attrs.get(name) == value for name, value in conditions)
+            and (not visible_only or self.is_visible(tag))
+        )
+
+    def label_for(self, element) -> str:
+        """Text of the label associated with an element, matching extract_element_data's rules."""
+        label_text = ''
+        elem_id = element.get('id')
+        if elem_id:
+            label_text = self.labels_for.get(elem_id, '')
+        if not label_text:
+            label_text = self.ancestor_labels.get(id(element), '')
+        return label_text
+
+class ExtractedNode:
+    """An indexed element reported by the in-page extraction script."""
+    __slots__ = ('name', 'attrs', 'visible')
+
+    def __init__(self, name: str, attrs: Dict[str, str], visible: bool):
+        self.name = name
+        self.attrs = attrs
+        self.visible = visible
+
+class BrowserIndex(DocumentIndex):
+    """The attribute index of a page extracted in the browser, where visibility is known.
+
+    Built from the script's [tag, indexed attributes, visible] entries. There is
+    no tree, so it only answers count_matches; elements already carry their
+    labels and XPaths.
+    """
+
+    def __init__(self, entries: List[List[Any]]):
+        self.soup = None
+        self.entries = entries
+        self.xpaths = {}
+        self.labels_for = {}
+        self.ancestor_labels = {}
+        self.attribute_values = {}
+        for name, attrs, visible in entries:
+            node = ExtractedNode(name, attrs, visible)
+            for attr, value in attrs.items():
+                self.attribute_values.setdefault((attr, value), []).append(node)
+
+    def is_visible(self, tag) -> bool:
+        return tag.visible
+
+def bounded_text(element, limit: int = 50) -> str:
+    """Stripped text of an element cut to `limit` characters, reading only as much text as needed."""
+    parts: List[str] = []
+    length = 0
+    for string in element.strings:
+        if not parts:
+            string = string.lstrip()
+            if not string:
+                continue
+        parts.append(string)
+        length += len(string)
+        if length > limit and string.strip():
+            text = ''.join(parts)
+            if len(text.rstrip()) > limit:
+                return text[:limit].strip() + "..."
+    text = ''.join(parts).strip()
+    if len(text) > limit:
+        text = text[:limit].strip() + "..."
+    return text
+
+ELEMENT_FIELDS = (
+    'tag', 'id', 'class', 'type', 'name', 'placeholder', 'value', 'href', 'role', 'aria-label',
+    'data-testid', 'data-cy', 'data-test', 'data-automation-id', 'text_content', 'label',
+    'options', 'visible', 'xpath', 'required'
+)
+_FIELD_DEFAULTS = tuple({**{field: '' for field in ELEMENT_FIELDS}, 'options': (), 'visible': True, 'required': False}.items())
+_FIELD_INDEX = {field: i for i, field in enumerate(ELEMENT_FIELDS)}
+_OPTIONS_INDEX = _FIELD_INDEX['options']
+_INTERNED_INDEXES = tuple(_FIELD_INDEX[field] for field in ('tag', 'type', 'role'))  # Small vocabularies repeated on every page
+_NO_EXTRA = MappingProxyType({})
+
+class ElementRecord(MutableMapping):
+    """One extracted element, read and written like extract_element_data's dict but stored compactly.
+
+    The fixed fields share one tuple instead of a 25-entry hash table, so copies
+    can share it too; empty fields are the one interned '' rather than dict
+    entries. 'options' is stored and returned as a tuple, so it is read-only in
+    place: assign a new sequence to change it. Other keys (wire:* attributes,
+    ai_suggestions, bounding_box) live in an overflow dict under interned names,
+    created only when there are any. Iteration yields every fixed field and then
+    the extras, exactly as the dict did; to_dict() gives that dict back for JSON.
+    """
+    __slots__ = ('_fields', '_extra')
+
+    def __init__(self, data: Optional[Mapping] = None):
+        data = data if data is not None else _NO_EXTRA
+        fields = [data.get(field, default) for field, default in _FIELD_DEFAULTS]
+        for index in _INTERNED_INDEXES:
+            if type(fields[index]) is str:
+                fields[index] = sys.intern(fields[index])
+        fields[_OPTIONS_INDEX] = tuple(fields[_OPTIONS_INDEX])
+        self._fields = tuple(fields)
+        self._extra = {sys.intern(key): value for key, value in data.items() if key not in _FIELD_INDEX} or None
+
+    def __getitem__(self, key: str) -> Any:
+        index = _FIELD_INDEX.get(key)
+        if index is None:
+            return (self._extra or _NO_EXTRA)[key]
+        return self._fields[index]
+
+    def __setitem__(self, key: str, value: Any):
+        index = _FIELD_INDEX.get(key)
+        if index is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[sys.intern(key)] = value
+            return
+        if index == _OPTIONS_INDEX:
+            value = tuple(value)
+        elif index in _INTERNED_INDEXES and type(value) is str:
+            value = sys.intern(value)
+        self._fields = self._fields[:index] + (value,) + self._fields[index + 1:]
+
+    def __delitem__(self, key: str):
+        if key in _FIELD_INDEX:
+            raise KeyError(f'{key} is a fixed element field')
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from ELEMENT_FIELDS
+        yield from self._extra or ()
+
+    def __len__(self) -> int:
+        return len(ELEMENT_FIELDS) + len(self._extra or ())
+
+    def __contains__(self, key) -> bool:
+        return key in _FIELD_INDEX or key in (self._extra or ())
 
-def crawl_website(url: str) -> Dict[str, Any]:
-    """Crawl website using Playwright with enhanced error handling and retries."""
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                )
-                page = context.new_page()
-
-                # Set timeout and wait for network idle
-                page.set_default_timeout(30000)
-                page.goto(url, wait_until='networkidle')
-
-                # Wait for dynamic content
-                page.wait_for_load_state('domcontentloaded')
-                page.wait_for_load_state('networkidle')
-
-                html = page.content()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Get page metadata
-                page_title = soup.title.string if soup.title else "Unknown Page"
-                meta_description = soup.find('meta', {'name': 'description'})
-                description = meta_description['content'] if meta_description else ""
-
-                elements = []
-                interactive_selectors = ['input', 'button', 'a', 'form', 'select', 'textarea']
-                attr_selectors = [
-                    '[role="button"]', '[role="checkbox"]', '[role="radio"]', '[role="tab"]',
-                    '[role="menuitem"]', '[role="switch"]', '[data-testid]', '[data-cy]',
-                    '[data-test]', '[data-automation-id]', '[aria-label]'
-                ]
-
-                # Extract elements with enhanced data
-                for selector in interactive_selectors:
-                    for element in soup.find_all(selector):
-                        elem_data = extract_element_data(element, soup)
-                        ai_suggestions = get_ai_suggestions(elem_data, f"Page: {page_title}, Description: {description}")
-                        elem_data['ai_suggestions'] = ai_suggestions
-                        elements.append(elem_data)
-
-                for selector in attr_selectors:
-                    for element in soup.select(selector):
-                        if element.name not in interactive_selectors:
-                            elem_data = extract_element_data(element, soup)
-                            ai_suggestions = get_ai_suggestions(elem_data, f"Page: {page_title}, Description: {description}")
-                            elem_data['ai_suggestions'] = ai_suggestions
-                            elements.append(elem_data)
-
-                browser.close()
-                return {
-                    'elements': elements,
-                    'page_title': page_title,
-                    'description': description,
-                    'url': url
-                }
+    def __repr__(self) -> str:
+        return f'ElementRecord({self.to_dict()!r})'
 
-        except PlaywrightTimeoutError:
-            retry_count += 1
-            if retry_count == max_retries:
-                return {'error': 'Page load timeout after multiple retries', 'elements': []}
-            continue
-        except Exception as e:
-            return {'error': str(e), 'elements': []}
-    
-    return {'error': 'Failed to crawl website after retries', 'elements': []}
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_INDEX:
+            return self[key]
+        return (self._extra or _NO_EXTRA).get(key, default)
 
-def extract_element_data(element, soup):
-    """Extract relevant data from an HTML element, including labels and Livewire attributes."""
+    # Whole-record reads go through one dict built straight from the tuple
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def copy(self) -> 'ElementRecord':
+        """A shallow copy, like dict(element); the fixed fields are shared until one is assigned."""
+        record = ElementRecord.__new__(ElementRecord)
+        record._fields = self._fields
+        record._extra = dict(self._extra) if self._extra else None
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = dict(zip(ELEMENT_FIELDS, self._fields))
+        data['options'] = list(data['options'])
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+def _json_default(value: Any) -> Any:
+    """json.dumps hook turning ElementRecords back into the dicts clients and caches expect."""
+    if isinstance(value, ElementRecord):
+        return value.to_dict()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def extract_element_data(element, soup, index: Optional[DocumentIndex] = None) -> ElementRecord:
+    """Extract relevant data from an HTML element, including labels and Livewire attributes.
+
+    Pass the page's DocumentIndex when extracting many elements from one document.
+    """
     class_list = element.get('class', [])
     class_str = ' '.join(class_list) if isinstance(class_list, list) else class_list
     text_content = ''
     if element.name not in ['input', 'textarea', 'select']:
-        text_content = element.get_text().strip()
-        if len(text_content) > 50:
-            text_content = text_content[:50].strip() + "..."
-        text_content = re.sub(r'\s+', ' ', text_content)
+        text_content = re.sub(r'\s+', ' ', bounded_text(element))
 
     # Attempt to find an associated label
-    label_text = ''
-    elem_id = element.get('id')
-    if elem_id:
-        label = soup.find('label', attrs={'for': elem_id})
-        if label:
-            label_text = re.sub(r'\s+', ' ', label.get_text(strip=True))
-    if not label_text:
-        parent_label = element.find_parent('label')
-        if parent_label:
-            label_text = re.sub(r'\s+', ' ', parent_label.get_text(strip=True))
+    if index is not None:
+        label_text = index.label_for(element)
+    else:
+        label_text = ''
+        elem_id = element.get('id')
+        if elem_id:
+            label = soup.find('label', attrs={'for': elem_id})
+            if label:
+                label_text = re.sub(r'\s+', ' ', label.get_text(strip=True))
+        if not label_text:
+            parent_label = element.find_parent('label')
+            if parent_label:
+                label_text = re.sub(r'\s+', ' ', parent_label.get_text(strip=True))
 
     wire_attrs = {k: element.get(k) for k in element.attrs if k.startswith('wire:')}
 
@@ -171,7 +2048,7 @@ def extract_element_data(element, soup):
                 'value': opt.get('value', '')
             })
 
-    return {
+    return ElementRecord({
         'tag': element.name,
         'id': element.get('id', ''),
         'class': class_str,
@@ -190,10 +2067,10 @@ def extract_element_data(element, soup):
         'label': label_text,
         'options': options,
         'visible': True,
-        'xpath': get_xpath(element),
+        'xpath': index.xpath(element) if index is not None else get_xpath(element),
         'required': element.has_attr('required'),
         **wire_attrs
-    }
+    })
 
 def get_xpath(element):
     """Calculate a simple XPath for an element."""
@@ -212,8 +2089,17 @@ def get_xpath(element):
     components.reverse()
     return f"//{'/'.join(components)}" if components else f"//{element.name}"
 
-def validate_selector(selector, soup):
-    """Validate selector uniqueness, escaping :visible for BeautifulSoup."""
+def validate_selector(selector, soup, index: Optional[DocumentIndex] = None):
+    """Validate selector uniqueness, from the document index when it can answer."""
+    if index is not None:
+        count = index.count_matches(selector)
+        if count is not None:
+            return f"{selector}:nth-of-type(1)" if count > 1 else selector
+
+    if soup is None:
+        # Browser-extracted pages have no DOM to check against
+        return selector
+
     # Escape :visible for BeautifulSoup parsing
     bs_selector = selector.replace(':visible', '\\:visible')
     try:
@@ -225,7 +2111,7 @@ def validate_selector(selector, soup):
         # Fallback to original selector if parsing fails
         return selector
 
-def get_best_selector(element, soup):
+def get_best_selector(element, soup, index: Optional[DocumentIndex] = None):
     """Generate a robust selector with uniqueness validation, prioritizing stable attributes."""
     selectors = []
     is_interactive = element['tag'] in ['input', 'button', 'form', 'select', 'textarea'] or element.get('role') in ['button', 'checkbox', 'radio']
@@ -251,14 +2137,14 @@ def get_best_selector(element, soup):
         compound = f"{element['tag']}{''.join(selectors[:2])}"
         if is_interactive:
             compound += ':visible'
-        return validate_selector(compound, soup)
+        return validate_selector(compound, soup, index)
     
     if element.get('placeholder'):
         placeholder_escaped = element['placeholder'].replace("'", "\\'")
         selector = f"[placeholder='{placeholder_escaped}']"
         if is_interactive:
             selector += ':visible'
-        return validate_selector(selector, soup)
+        return validate_selector(selector, soup, index)
     return element['xpath']
 
 def generate_realistic_input_value(element):
@@ -284,49 +2170,37 @@ def generate_realistic_input_value(element):
     else:
         return 'Test Input Value'
 
+# Generated files are rendered from templates/cypress/, compiled once at startup
+cypress_templates = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'cypress')),
+    autoescape=False,
+    keep_trailing_newline=True,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+    undefined=jinja2.StrictUndefined
+)
+_CYPRESS_TEMPLATES = {
+    name: cypress_templates.get_template(f'{name}.js.j2')
+    for name in ('suite_header', 'loads_page', 'e2e_header', 'form_submission', 'login_valid', 'login_invalid',
+                 'required_field', 'livewire_state', 'suite_footer', 'page_object')
+}
+
+def render_cypress_template(name: str, **context) -> str:
+    return _CYPRESS_TEMPLATES[name].render(context)
+
+def wire_model_selector(model: str) -> str:
+    """Selector for a Livewire-bound field, with the colon escaped for Cypress."""
+    return f"[wire\\\\:model='{model}']"
+
 def generate_page_object(url_data):
     """Generate a page object class for Cypress tests with practical helpers."""
-    page_name = url_data['page_title'].replace(' ', '')
-    script = f"""// Page Object for {url_data['page_title']}
-// Encapsulates selectors and actions for maintainability
-
-class {page_name}Page {{
-  visit() {{
-    cy.visit('{url_data['url']}');
-  }}
-
-  get(selector) {{
-    return cy.get(selector);
-  }}
-
-  type(selector, value) {{
-    this.get(selector).clear().type(value);
-  }}
-
-  select(selector, valueOrText) {{
-    this.get(selector).select(valueOrText);
-  }}
-
-  check(selector) {{
-    this.get(selector).check({{ force: true }});
-  }}
-
-  click(selector) {{
-    this.get(selector).click();
-  }}
-
-  login(email, password) {{
-    this.get('form').within(() => {{
-      this.type('[type="email"]', email);
-      this.type('[type="password"]', password);
-      this.click('[type="submit"]');
-    }});
-  }}
-}}
-
-module.exports = {page_name}Page;
-"""
-    return script
+    return render_cypress_template(
+        'page_object',
+        page_title=url_data['page_title'],
+        page_name=url_data['page_title'].replace(' ', ''),
+        url=url_data['url']
+    )
 
 def generate_fixture_data():
     """Generate a JSON fixture file for test data."""
@@ -337,259 +2211,1361 @@ def generate_fixture_data():
         ]
     }
 
-def generate_cypress_script(url_data, soup):
-    """Generate a Cypress test script with enhanced tests and structure following docs."""
+def iter_cypress_script(url_data, soup, index: Optional[DocumentIndex] = None) -> Iterator[Tuple[Optional[str], str]]:
+    """Yield the Cypress test script as (test_name, code) chunks in output order.
+
+    Every `it(...)` block is its own chunk named after its test; the suite
+    scaffolding around them has no name. Joined, the chunks are the full script.
+    Elements the browser reported as hidden get no tests.
+    """
     url = url_data['url']
-    elements = url_data['elements']
     page_title = url_data['page_title'].strip()
-    domain = urlparse(url).netloc
-    page_name = page_title.replace(' ', '')
-
-    script = f"""// {page_title} Test Suite for {domain}
-// Generated on: {url}
-// Purpose: Smoke, E2E, authentication, and Livewire tests
-// Note: Uses page object model and fixtures for maintainability
-// Requires: npm install cypress mochawesome cypress-wait-until
-
-const {page_name}Page = require('./{page_name}Page');
-
-Cypress.config('defaultCommandTimeout', 10000);
-Cypress.config('pageLoadTimeout', 30000);
-
-describe('{page_title} - Automated Test Suite', () => {{
-  const page = new {page_name}Page();
-
-  before(() => {{
-    // Load test data from fixtures
-    cy.fixture('test_data.json').as('testData');
-  }});
-
-  beforeEach(() => {{
-    // Visit page and wait for Livewire to load
-    page.visit();
-    cy.window().should('have.property', 'document.readyState', 'complete');
-    cy.get('body').should('be.visible');
-    cy.intercept('POST', '**/_livewire**').as('livewireUpdate');
-  }});
-
-  describe('Smoke Tests', () => {{
-    it('loads the page successfully', () => {{
-      // Verifies page loads and is interactable
-      cy.url().should('eq', '{url}');
-      cy.title().should('not.be.empty');
-      page.getElement('body').should('be.visible');
-      cy.on('uncaught:exception', (err) => {{
-        cy.log(`Unhandled exception: ${{err.message}}`);
-        return false;
-      }});
-    }});
-  }});
-
-  describe('End-to-End Tests', () => {{
-"""
-    # Form submission test
-    forms = [e for e in elements if e['tag'] == 'form']
-    inputs = [e for e in elements if e['tag'] == 'input']
-    buttons = [e for e in elements if e['tag'] == 'button' or e['role'] == 'button']
 
+    # Sort the visible elements into the roles the tests need in one pass, in document order
+    forms, inputs, buttons, required_fields, livewire_elements = [], [], [], [], []
+    for element in url_data['elements']:
+        if not element.get('visible', True):
+            continue
+        if element['tag'] == 'form':
+            forms.append(element)
+        elif element['tag'] == 'input':
+            inputs.append(element)
+        if element['tag'] == 'button' or element['role'] == 'button':
+            buttons.append(element)
+        if element.get('required'):
+            required_fields.append(element)
+        if element.get('wire:model'):
+            livewire_elements.append(element)
+
+    yield None, render_cypress_template(
+        'suite_header', page_title=page_title, domain=urlparse(url).netloc, url=url, page_name=page_title.replace(' ', '')
+    )
+    yield 'loads the page successfully', render_cypress_template('loads_page', url=url)
+    yield None, render_cypress_template('e2e_header')
+
+    # Form submission test
     if forms:
         form = forms[0]
-        form_selector = get_best_selector(form, soup)
-        form_fields = [e for e in inputs if e.get('form') == form.get('id') or not e.get('form')]
-        submit_button = next((b for b in buttons if 'submit' in b.get('type', '').lower()), None)
-
-        script += f"""
-    it('completes a Livewire form submission', () => {{
-      // Fills and submits a form, verifying Livewire update
-      // Assumes success message or redirect on submission
-      page.getElement('{form_selector}').should('exist').within(() => {{
-"""
-        for field in form_fields:
+        fields = []
+        for field in inputs:
+            if field.get('form') and field.get('form') != form.get('id'):
+                continue
+            if field['type'] in ['submit', 'button', 'hidden'] or field['name'].startswith('_'):
+                continue
             wire_model = field.get('wire:model', '')
-            field_selector = f"[wire\\\\:model='{wire_model}']" if wire_model else get_best_selector(field, soup)
-            test_value = generate_realistic_input_value(field)
-            if field['type'] not in ['submit', 'button', 'hidden'] and not field['name'].startswith('_'):
-                script += f"""        page.getElement('{field_selector}')
-          .type('{test_value}', {{ delay: 50 }})
-          .should('have.value', '{test_value}');
-"""
-        if submit_button:
-            submit_selector = get_best_selector(submit_button, soup)
-            script += f"""        page.getElement('{submit_selector}').click();
-      }});
-      cy.wait('@livewireUpdate').its('response.statusCode').should('eq', 200);
-      cy.get('body').should('contain', 'success'); // Adjust based on response
-    }});
-"""
+            fields.append((
+                wire_model_selector(wire_model) if wire_model else get_best_selector(field, soup, index),
+                generate_realistic_input_value(field)
+            ))
+        submit_button = next((b for b in buttons if 'submit' in b.get('type', '').lower()), None)
+        yield 'completes a Livewire form submission', render_cypress_template(
+            'form_submission',
+            form_selector=get_best_selector(form, soup, index),
+            fields=fields,
+            submit_selector=get_best_selector(submit_button, soup, index) if submit_button else None
+        )
 
     # Authentication tests
     login_form = next((f for f in forms if any('email' in i.get('name', '').lower() or i['type'] == 'email' for i in inputs)), None)
     if login_form:
-        script += f"""
-    it('tests login with valid credentials', function() {{
-      // Tests successful login using fixture data
-      // Assumes redirect to dashboard on success
-      page.login(this.testData.users[0].email, this.testData.users[0].password);
-      cy.wait('@livewireUpdate');
-      cy.url().should('include', '/dashboard'); // Adjust based on redirect
-      cy.contains(this.testData.users[0].email); // Verify user data
-    }});
-
-    it('tests login with invalid credentials', function() {{
-      // Tests login failure with invalid credentials
-      // Assumes error message is displayed
-      page.login(this.testData.users[1].email, this.testData.users[1].password);
-      cy.wait('@livewireUpdate');
-      cy.contains('Invalid credentials'); // Adjust based on error message
-    }});
-"""
+        yield 'tests login with valid credentials', render_cypress_template('login_valid')
+        yield 'tests login with invalid credentials', render_cypress_template('login_invalid')
 
     # Error handling test
-    required_fields = [e for e in elements if e.get('required')]
     if required_fields:
-        field = required_fields[0]
-        field_selector = get_best_selector(field, soup)
-        script += f"""
-    it('validates required field', () => {{
-      // Tests form validation for required field
-      // Assumes error class or message on validation failure
-      page.getElement('{field_selector}').clear();
-      page.getElement('form').submit();
-      page.getElement('{field_selector}').should('have.class', 'error'); // Adjust based on validation
-    }});
-"""
+        yield 'validates required field', render_cypress_template(
+            'required_field', field_selector=get_best_selector(required_fields[0], soup, index)
+        )
 
     # Livewire state test
-    livewire_elements = [e for e in elements if e.get('wire:model')]
     if livewire_elements:
         element = livewire_elements[0]
-        selector = f"[wire\\\\:model='{element['wire:model']}']"
-        test_value = generate_realistic_input_value(element)
-        script += f"""
-    it('verifies Livewire state update', () => {{
-      // Tests Livewire component state update
-      // Verifies input value persists after Livewire update
-      page.getElement('{selector}').type('{test_value}', {{ delay: 50 }});
-      cy.wait('@livewireUpdate');
-      page.getElement('{selector}').should('have.value', '{test_value}');
-    }});
-"""
-
-    script += """
-  });
-}});
-"""
-    return script
+        yield 'verifies Livewire state update', render_cypress_template(
+            'livewire_state',
+            selector=wire_model_selector(element['wire:model']),
+            test_value=generate_realistic_input_value(element)
+        )
+
+    yield None, render_cypress_template('suite_footer')
+
+def generate_cypress_script(url_data, soup, index: Optional[DocumentIndex] = None):
+    """Generate a Cypress test script with enhanced tests and structure following docs."""
+    return ''.join(code for _, code in iter_cypress_script(url_data, soup, index))
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
-@app.route('/api/generate', methods=['POST'])
-def generate_script():
-    try:
-        if not request.is_json:
-            return jsonify({'error': 'Request must be JSON'}), 400
-            
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid JSON data'}), 400
-            
-        url = data.get('url')
-        if not url:
-            return jsonify({'error': 'URL is required'}), 400
-            
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        url_data = crawl_website(url)
-        if 'error' in url_data:
-            return jsonify({
-                'error': 'Failed to crawl website',
-                'details': url_data['error']
-            }), 400
-            
-        if not url_data['elements']:
-            return jsonify({
-                'error': 'No testable elements found',
-                'details': 'The page might be using client-side rendering or blocking crawlers'
-            }), 400
-        
-        # Generate page object with AI-enhanced selectors
-        page_script = generate_page_object(url_data)
-        page_filename = secure_filename(f"{url_data['page_title'].replace(' ', '')}Page.js")
-        page_filepath = os.path.join(app.config['UPLOAD_FOLDER'], page_filename)
-        
-        with open(page_filepath, 'w') as f:
-            f.write(page_script)
-        
-        # Generate fixture with AI-suggested test data
-        fixture_data = generate_fixture_data()
-        fixture_filename = 'test_data.json'
-        fixture_filepath = os.path.join(app.config['UPLOAD_FOLDER'], fixture_filename)
-        
-        with open(fixture_filepath, 'w') as f:
-            json.dump(fixture_data, f, indent=2)
-        
-        # Generate Cypress script with AI-enhanced tests
-        soup = BeautifulSoup(requests.get(url, timeout=30).text, 'html.parser')
-        script = generate_cypress_script(url_data, soup)
-        
-        # Lint the script with ESLint
-        temp_filename = f"temp_{uuid.uuid4()}.js"
-        temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
+_JS_PUNCTUATORS = '|'.join(re.escape(p) for p in sorted([
+    '>>>=', '...', '===', '!==', '**=', '<<=', '>>=', '>>>', '&&=', '||=', '??=',
+    '=>', '==', '!=', '<=', '>=', '&&', '||', '??', '?.', '++', '--', '+=', '-=', '*=', '/=', '%=',
+    '&=', '|=', '^=', '**', '<<', '>>',
+    '{', '}', '(', ')', '[', ']', ';', ',', '<', '>', '+', '-', '*', '/', '%', '&', '|', '^', '!', '~',
+    '?', ':', '=', '.', '@', '#'
+], key=len, reverse=True))
+_JS_TOKEN = re.compile(
+    r"(?P<newline>\n)"
+    r"|(?P<space>[ \t\f\v\r\u00a0\ufeff]+)"
+    r"|(?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))"
+    r"|(?P<string>'(?:[^'\\\n]|\\[\s\S])*'?|\"(?:[^\"\\\n]|\\[\s\S])*\"?)"
+    r"|(?P<ident>[A-Za-z_$\u0080-\uffff][\w$\u0080-\uffff]*)"
+    r"|(?P<number>\.?\d[\w.]*)"
+    rf"|(?P<punct>{_JS_PUNCTUATORS})"
+)
+_JS_REGEX_PREFIX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else', 'yield', 'await'}
+# Tokens after which a line break never ends a statement
+_JS_CONTINUATION_KEYWORDS = {'if', 'else', 'for', 'while', 'do', 'try', 'catch', 'finally', 'switch', 'function', 'class',
+                             'const', 'let', 'var', 'new', 'typeof', 'instanceof', 'in', 'of', 'delete', 'void', 'await',
+                             'yield', 'extends', 'case', 'default', 'import', 'export', 'async', 'static', 'get', 'set'}
+_JS_CONTROL_KEYWORDS = {'if', 'for', 'while', 'with', 'switch', 'catch'}
+_JS_BLOCK_PREFIX_KEYWORDS = {'else', 'try', 'finally', 'do'}
+# Keywords after which `function` starts an expression rather than a declaration
+_JS_EXPRESSION_PREFIX_KEYWORDS = _JS_REGEX_PREFIX_KEYWORDS - {'do', 'else'}
+
+def _scan_js_template(source: str, start: int) -> Tuple[int, bool]:
+    """Scan template text from `start`; return (end, opened_substitution)."""
+    i = start
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '`':
+            return i + 1, False
+        if char == '$' and source.startswith('${', i):
+            return i + 2, True
+        i += 1
+    return i, False
+
+def _scan_js_regex(source: str, start: int) -> Optional[int]:
+    """Return the index past a regex literal at `start`, or None if it isn't one."""
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\n':
+            return None
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] in '_$'):
+                i += 1
+            return i
+        i += 1
+    return None
+
+def tokenize_js(source: str) -> List[Tuple[str, str]]:
+    """Split JavaScript into (kind, text) tokens in one pass; joining the texts gives the source back.
+
+    Kinds are 'space', 'newline', 'comment', 'string', 'template', 'regex', 'number',
+    'ident' and 'punct'. Template literals are split around their ${...} substitutions.
+    """
+    tokens: List[Tuple[str, str]] = []
+    template_braces: List[int] = []  # open braces inside each active ${...}
+    previous = None  # last significant token
+    i = 0
+    length = len(source)
+    while i < length:
+        char = source[i]
+        start = i
+        regex_end = None
+        if char == '/' and source[i + 1:i + 2] not in ('/', '*') and (
+                previous is None or (previous[0] == 'punct' and previous[1] not in (')', ']', '}'))
+                or (previous[0] == 'ident' and previous[1] in _JS_REGEX_PREFIX_KEYWORDS)):
+            regex_end = _scan_js_regex(source, i)
+        if char == '`' or (char == '}' and template_braces and template_braces[-1] == 0):
+            if char == '}':
+                template_braces.pop()
+            i, opened = _scan_js_template(source, i + 1)
+            if opened:
+                template_braces.append(0)
+            kind = 'template'
+        elif regex_end is not None:
+            i = regex_end
+            kind = 'regex'
+        else:
+            match = _JS_TOKEN.match(source, i)
+            if match:
+                kind = match.lastgroup
+                i = match.end()
+            else:
+                kind = 'punct'
+                i += 1
+            if kind in ('space', 'newline', 'comment'):
+                tokens.append((kind, source[start:i]))
+                continue
+            if template_braces and kind == 'punct':
+                if char == '{':
+                    template_braces[-1] += 1
+                elif char == '}':
+                    template_braces[-1] -= 1
+        previous = (kind, source[start:i])
+        tokens.append(previous)
+    return tokens
+
+def _js_line_ends_statement(token: Tuple[str, str]) -> bool:
+    kind, text = token
+    if kind in ('string', 'number', 'regex'):
+        return True
+    if kind == 'template':
+        return text.endswith('`')
+    if kind == 'ident':
+        return text not in _JS_CONTINUATION_KEYWORDS
+    return text in (')', ']', '}', '++', '--')
+
+def _js_line_continues(token: Optional[Tuple[str, str]]) -> bool:
+    """Whether a line starting with `token` continues the previous line's expression."""
+    if token is None:
+        return False
+    kind, text = token
+    if kind == 'template':
+        return True
+    if kind == 'ident':
+        return text in ('in', 'of', 'instanceof')
+    return kind == 'punct' and text not in ('}', '!', '~', '++', '--', '@', '#', '{')
+
+def fix_common_linting_issues(script: str) -> str:
+    """Fix common ESLint issues (no-unused-vars, no-console, semi) in one pass over the tokens.
+
+    Unused single `const` declarations and statement-level console.log calls are
+    dropped, and a semicolon is added wherever a line break ends a statement, and
+    before the `else` of a braceless if body.
+    """
+    tokens = tokenize_js(script)
+    significant = [i for i, (kind, _) in enumerate(tokens) if kind not in ('space', 'newline', 'comment')]
+
+    def sig(n: int) -> Optional[Tuple[str, str]]:
+        return tokens[significant[n]] if 0 <= n < len(significant) else None
+
+    def line_break_after(n: int) -> bool:
+        end = significant[n + 1] if n + 1 < len(significant) else len(tokens)
+        return any(tokens[i][0] == 'newline' or (tokens[i][0] == 'comment' and '\n' in tokens[i][1])
+                   for i in range(significant[n] + 1, end))
+
+    # Identifier references, ignoring property names after '.' / '?.'
+    references: Dict[str, int] = {}
+    for n in range(len(significant)):
+        kind, text = sig(n)
+        if kind == 'ident' and not (n > 0 and sig(n - 1)[1] in ('.', '?.')):
+            references[text] = references.get(text, 0) + 1
+
+    def expression_position(n: int) -> bool:
+        """Whether the token at `n` starts an expression, e.g. `function` after '=', '(' or ','."""
+        prev = sig(n - 1)
+        if prev is None:
+            return False
+        if prev[0] == 'punct':
+            return prev[1] not in (';', '{', '}', ')', ']')
+        return prev[0] == 'ident' and prev[1] in _JS_EXPRESSION_PREFIX_KEYWORDS
+
+    # '(', '[', '{object', '{block', '{do' (a do-while body) or '{expr' (the body of a
+    # function expression or arrow, after which a statement may still end)
+    stack: List[str] = []
+    paren_control: List[bool] = []  # whether each open '(' belongs to if/for/while/...
+    function_expression: Optional[int] = None  # stack depth of a function expression awaiting its body
+    do_body_end = -1  # token index of the '}' closing the last do-while body
+    semicolons = set()
+    removals: List[Tuple[int, int]] = []
+    pending: Optional[List[Any]] = None  # [start, depth, removable] of a statement we may drop
+    at_start = True
+    for n in range(len(significant)):
+        kind, text = sig(n)
+        prev = sig(n - 1)
+        if at_start and pending is None:
+            if (kind, text) == ('ident', 'const') and sig(n + 1) and sig(n + 1)[0] == 'ident' \
+                    and sig(n + 2) == ('punct', '=') and references.get(sig(n + 1)[1]) == 1:
+                pending = [n, len(stack), True]
+            elif (kind, text) == ('ident', 'console') and sig(n + 1) == ('punct', '.') \
+                    and sig(n + 2) == ('ident', 'log') and sig(n + 3) == ('punct', '('):
+                pending = [n, len(stack), True]
+
+        closed = None
+        if kind == 'punct':
+            if text == '(':
+                # The `while (...)` of a do-while ends its statement rather than opening a body
+                paren_control.append(prev is not None and prev[0] == 'ident' and prev[1] in _JS_CONTROL_KEYWORDS
+                                     and not (prev[1] == 'while' and do_body_end == n - 2))
+                stack.append('(')
+            elif text == '[':
+                stack.append('[')
+            elif text == '{':
+                is_block = (prev is None or prev[1] in (')', '=>', ';', '{', '}') or at_start
+                            or (prev[0] == 'ident' and prev[1] in _JS_BLOCK_PREFIX_KEYWORDS)
+                            or (n > 1 and sig(n - 2)[1] in ('class', 'extends')))
+                if not is_block:
+                    stack.append('{object')
+                elif function_expression == len(stack) or (prev is not None and prev[1] == '=>'):
+                    function_expression = None
+                    stack.append('{expr')
+                elif prev == ('ident', 'do'):
+                    stack.append('{do')
+                else:
+                    stack.append('{block')
+            elif text in (')', ']', '}') and stack:
+                closed = stack.pop()
+                if closed == '(' and paren_control.pop():
+                    closed = 'control'
+                elif closed == '{do':
+                    do_body_end = n
+            elif text == ',' and pending is not None and len(stack) == pending[1]:
+                pending[2] = False  # several declarators
+        elif (kind, text) == ('ident', 'function') and \
+                expression_position(n - 1 if prev == ('ident', 'async') else n):
+            function_expression = len(stack)
+        if pending is not None and len(stack) < pending[1]:
+            pending = None
+
+        at_start = False
+        if stack and stack[-1] in ('(', '[', '{object'):
+            continue
+        if (kind, text) == ('punct', ';'):
+            ends_statement = True
+        else:
+            nxt = sig(n + 1)
+            # A braceless if body ends before its `else`, on the same line or not
+            ends_statement = (
+                _js_line_ends_statement((kind, text)) and closed not in ('{block', '{do', 'control')
+                and (nxt == ('ident', 'else') or (
+                    line_break_after(n) and not _js_line_continues(nxt)
+                    and not (nxt is not None and nxt[1] in ('catch', 'finally'))
+                ))
+            )
+            if ends_statement and (nxt is None or nxt[1] != ';'):
+                semicolons.add(n)
+        at_start = ends_statement or (kind == 'punct' and text in ('{', '}'))
+        if ends_statement and pending is not None:
+            if pending[2] and len(stack) == pending[1]:
+                removals.append((pending[0], n))
+            pending = None
+
+    # Drop removed statements, taking their whole line when they are alone on it
+    removed = set()
+    for start, end in removals:
+        first, last = significant[start], significant[end]
+        while first > 0 and tokens[first - 1][0] == 'space':
+            first -= 1
+        while last + 1 < len(tokens) and tokens[last + 1][0] == 'space':
+            last += 1
+        if (first == 0 or tokens[first - 1][0] == 'newline') and last + 1 < len(tokens) and tokens[last + 1][0] == 'newline':
+            last += 1
+        else:
+            first = significant[start]
+        removed.update(range(first, last + 1))
+        semicolons.difference_update(range(start, end + 1))
+
+    semicolon_after = {significant[n] for n in semicolons}
+    output = []
+    for i, (_, text) in enumerate(tokens):
+        if i in removed:
+            continue
+        output.append(text)
+        if i in semicolon_after:
+            output.append(';')
+    return ''.join(output)
+
+class LintWorker:
+    """A resident Node process running ESLint in memory, restarted when it dies.
+
+    Requests are serialized; `lint` returns None when Node or ESLint isn't
+    available, or the worker keeps failing, so callers can fall back to the CLI.
+    Only I/O failures and timeouts restart the process. An error ESLint reports
+    for a request, such as a missing config, leaves it running, and after
+    `max_errors` of those in a row the worker is treated as unavailable.
+    """
+
+    def __init__(self, script_path: str, timeout: float, max_errors: int = 3):
+        self.script_path = script_path
+        self.timeout = timeout
+        self.max_errors = max_errors
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._unavailable = False
+        self._errors = 0
+
+    def lint(self, script: str, file_path: str) -> Optional[Dict[str, Any]]:
+        """Lint and fix a script; returns {'output', 'errorCount', 'messages'} or None."""
+        with self._lock:
+            for _ in range(2):
+                if self._unavailable or not self._ensure_running():
+                    return None
+                request_id = uuid.uuid4().hex
+                try:
+                    self._proc.stdin.write(json.dumps({'id': request_id, 'text': script, 'filePath': file_path}) + '\n')
+                    self._proc.stdin.flush()
+                    response = self._read()
+                except (OSError, ValueError, queue.Empty) as e:
+                    print(f"Lint worker failed, restarting: {str(e)}")
+                    self._stop()
+                    continue
+                if response.get('id') != request_id:
+                    print("Lint worker out of sync, restarting")
+                    self._stop()
+                    continue
+                if 'error' in response:
+                    print(f"Lint worker error: {response['error']}")
+                    self._errors += 1
+                    if self._errors >= self.max_errors:
+                        print("Lint worker keeps failing; using the eslint CLI from now on")
+                        self._unavailable = True
+                        self._stop()
+                    return None
+                self._errors = 0
+                return response
+            return None
+
+    def shutdown(self):
+        with self._lock:
+            self._stop()
+
+    def _ensure_running(self) -> bool:
+        if self._proc is not None and self._proc.poll() is None:
+            return True
+        self._stop()
+        if shutil.which('node') is None:
+            self._unavailable = True
+            return False
+        self._proc = subprocess.Popen(
+            ['node', self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc.stdout, self._lines), daemon=True).start()
+        try:
+            handshake = self._read()
+        except (ValueError, queue.Empty):
+            handshake = {}
+        if not handshake.get('ready'):
+            print(f"ESLint worker unavailable: {handshake.get('error', 'no handshake')}")
+            self._unavailable = True
+            self._stop()
+            return False
+        return True
+
+    def _read(self) -> Dict[str, Any]:
+        line = self._lines.get(timeout=self.timeout)
+        if line is None:
+            raise OSError('lint worker exited')
+        return json.loads(line)
+
+    @staticmethod
+    def _pump(stream, lines: queue.Queue):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    def _stop(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=5)
+            except Exception:
+                pass
+        self._proc = None
+        self._lines = None
+
+lint_worker = LintWorker(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lint_worker.js'),
+    timeout=app.config['LINT_TIMEOUT']
+)
+atexit.register(lint_worker.shutdown)
+
+def _lint_script_with_cli(script: str) -> str:
+    """Lint through a temp file and the eslint CLI, fixing common issues on errors."""
+    temp_filename = f"temp_{uuid.uuid4()}.js"
+    temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
+    
+    with open(temp_filepath, 'w') as f:
+        f.write(script)
         
-        with open(temp_filepath, 'w') as f:
-            f.write(script)
-            
+    try:
         result = subprocess.run(
             ['eslint', '--fix', temp_filepath],
             capture_output=True,
             text=True
         )
-        
-        if result.returncode != 0:
-            print(f"Linting errors: {result.stderr}")
-            # Try to fix common linting issues
-            script = fix_common_linting_issues(script)
-        
+    finally:
         os.remove(temp_filepath)
+    
+    if result.returncode != 0:
+        print(f"Linting errors: {result.stderr}")
+        # Try to fix common linting issues
+        script = fix_common_linting_issues(script)
+    return script
+
+def lint_script(script: str) -> str:
+    """Lint a generated script with ESLint --fix, preferring the resident worker."""
+    file_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], 'generated.js'))
+    result = lint_worker.lint(script, file_path)
+    if result is None:
+        return _lint_script_with_cli(script)
+    if result['errorCount']:
+        print(f"Linting errors: {'; '.join(result['messages'])}")
+        # Try to fix common linting issues
+        return fix_common_linting_issues(result['output'])
+    return result['output']
+
+class GenerationError(Exception):
+    """A generation failure reported to the client as {'error', 'details'} with an HTTP status."""
+
+    def __init__(self, error: str, details: Optional[str] = None, status: int = 400):
+        super().__init__(error)
+        self.error = error
+        self.details = details
+        self.status = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = {'error': self.error}
+        if self.details is not None:
+            payload['details'] = self.details
+        return payload
+
+class FingerprintStore:
+    """What the last generation of each page saw and produced, for incremental re-runs.
+
+    A record holds the page's HTTP validators, a hash of its element set, a hash
+    per generated test, the pre-lint script hash, its links and the generation
+    result. Records are keyed by URL and output directory, since reusing a page
+    means reusing the files in that directory.
+    """
+
+    def __init__(self, path: str = ''):
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(url: str, output_dir: str) -> str:
+        return json.dumps([normalize_url(url) or url, os.path.abspath(output_dir)])
+
+    def get(self, url: str, output_dir: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute('SELECT value FROM fingerprints WHERE key = ?', (self._key(url, output_dir),)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, url: str, output_dir: str, record: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO fingerprints (key, value, updated_at) VALUES (?, ?, ?)',
+                (self._key(url, output_dir), json.dumps(record), time.time())
+            )
+            self._db.commit()
+
+fingerprint_store = FingerprintStore(app.config['FINGERPRINT_STORE_PATH'])
+
+# Livewire re-renders these with fresh ids and state on every request
+_VOLATILE_ATTRIBUTES = ('wire:id', 'wire:snapshot', 'wire:effects', 'wire:initial-data')
+
+def element_set_hash(elements: List[Dict[str, Any]]) -> str:
+    """Hash the extracted element set, ignoring AI suggestions and per-request noise.
+
+    Hidden input values (CSRF tokens and the like), Livewire's per-render
+    attributes and browser-reported bounding boxes change between loads without
+    changing what there is to test.
+    """
+    normalized = []
+    for element in elements:
+        element = {
+            k: v for k, v in element.items()
+            if k not in ('ai_suggestions', 'bounding_box') and k not in _VOLATILE_ATTRIBUTES
+        }
+        if element.get('type') == 'hidden':
+            element['value'] = ''
+        normalized.append(element)
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _artifacts_exist(result: Dict[str, Any], output_dir: str) -> bool:
+    return all(os.path.exists(os.path.join(output_dir, result[key]))
+               for key in ('filename', 'page_filename', 'fixture_filename'))
+
+def _write_if_changed(path: str, content: str) -> bool:
+    """Write content to path unless the file already holds exactly that; report whether it wrote.
+
+    The file is replaced atomically, so concurrent generations never leave a torn file behind.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == content:
+                return False
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    return True
+
+def _reused_result(previous: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    return {
+        **previous['result'],
+        'incremental': {
+            'status': 'reused',
+            'reason': reason,
+            'tests': {'reused': list(previous['test_hashes']), 'regenerated': [], 'removed': []}
+        }
+    }
+
+def revalidate_page(url: str, output_dir: str) -> Optional[Dict[str, Any]]:
+    """Return the stored record for url if a conditional GET says the page is unchanged.
+
+    Only pages whose last response carried an ETag or Last-Modified, and whose
+    artifacts are still on disk, are checked; any failure means "recrawl".
+    """
+    previous = fingerprint_store.get(url, output_dir)
+    if previous is None or not _artifacts_exist(previous['result'], output_dir):
+        return None
+    headers = {}
+    if previous['validators'].get('etag'):
+        headers['If-None-Match'] = previous['validators']['etag']
+    if previous['validators'].get('last_modified'):
+        headers['If-Modified-Since'] = previous['validators']['last_modified']
+    if not headers:
+        return None
+    try:
+        with requests.get(url, headers=headers, timeout=10, stream=True) as response:
+            return previous if response.status_code == 304 else None
+    except requests.RequestException as e:
+        print(f"Revalidation error for {url}: {str(e)}")
+        return None
+
+def iter_generation(url: str, incremental: bool = False, options: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Any]]:
+    """Crawl a URL and write its artifacts, yielding (event, data) pairs as results become available.
+
+    Events in order: 'page' metadata, one 'element' per extracted element,
+    'suggestions' once the AI step is done, 'page_object', one 'test' per
+    generated `it(...)` block and 'done' with the run_generation result.
+    'stage' events ({stage, progress}) mark the moves between pipeline steps.
+    With `incremental`, a page the server reports as not modified is reused
+    without crawling, and 'done' carries an 'incremental' report.
+    Raises GenerationError when the page can't be turned into tests.
+    """
+    output_dir = app.config['UPLOAD_FOLDER']
+    if incremental:
+        yield 'stage', {'stage': 'revalidating', 'progress': 5}
+        previous = revalidate_page(url, output_dir)
+        if previous is not None:
+            result = _reused_result(previous, 'not modified')
+            yield 'page', {
+                'url': url,
+                'page_title': result['page_title'],
+                'description': previous['description'],
+                'element_count': result['element_count']
+            }
+            yield 'done', result
+            return
+
+    yield 'stage', {'stage': 'crawling', 'progress': 10}
+    url_data = crawl_website(url, with_suggestions=False, options=options)
+    if 'error' in url_data:
+        raise GenerationError('Failed to crawl website', url_data['error'])
+        
+    if not url_data['elements']:
+        raise GenerationError(
+            'No testable elements found',
+            'The page might be using client-side rendering or blocking crawlers'
+        )
+
+    yield 'page', {
+        'url': url_data['url'],
+        'page_title': url_data['page_title'],
+        'description': url_data['description'],
+        'element_count': len(url_data['elements'])
+    }
+    for position, element in enumerate(url_data['elements']):
+        yield 'element', {'index': position, 'element': element}
+
+    yield from iter_page_artifacts(url_data, output_dir, incremental)
+
+def iter_page_artifacts(url_data: Dict[str, Any], output_dir: str, incremental: bool = False) -> Iterator[Tuple[str, Any]]:
+    """Fetch AI suggestions and write a crawled page's page object, fixture and linted script into output_dir.
+
+    Yields the 'stage', 'suggestions', 'page_object', 'test' and 'done' events of
+    iter_generation, and records the page's fingerprint. With `incremental` a
+    page whose element set is unchanged reuses its previous artifacts outright;
+    otherwise unchanged files are left alone and lint is skipped when the
+    generated script is the same as last time.
+    """
+    previous = fingerprint_store.get(url_data['url'], output_dir) if incremental else None
+    element_hash = element_set_hash(url_data['elements'])
+    validators = url_data.get('validators', {})
+    if previous is not None and previous['element_hash'] == element_hash and _artifacts_exist(previous['result'], output_dir):
+        fingerprint_store.set(url_data['url'], output_dir, {**previous, 'validators': validators})
+        yield 'done', _reused_result(previous, 'elements unchanged')
+        return
+
+    yield 'stage', {'stage': 'suggesting', 'progress': 30}
+    suggestions = attach_ai_suggestions(url_data)
+    yield 'suggestions', {'suggestions': suggestions}
+    written = []
+    
+    # Generate page object with AI-enhanced selectors
+    yield 'stage', {'stage': 'generating', 'progress': 60}
+    page_script = generate_page_object(url_data)
+    page_filename = secure_filename(f"{url_data['page_title'].replace(' ', '')}Page.js")
+    page_filepath = os.path.join(output_dir, page_filename)
+    
+    if _write_if_changed(page_filepath, page_script):
+        written.append(page_filename)
+    yield 'page_object', {'filename': page_filename, 'code': page_script}
+    
+    # Generate fixture with AI-suggested test data
+    fixture_data = generate_fixture_data()
+    fixture_filename = 'test_data.json'
+    fixture_filepath = os.path.join(output_dir, fixture_filename)
+    
+    if _write_if_changed(fixture_filepath, json.dumps(fixture_data, indent=2)):
+        written.append(fixture_filename)
+    
+    # Generate Cypress script against the same DOM the elements came from
+    snapshot = url_data['snapshot']
+    chunks = []
+    test_hashes = {}
+    for test_name, code in iter_cypress_script(url_data, snapshot.soup, snapshot.index):
+        chunks.append(code)
+        if test_name is not None:
+            test_hashes[test_name] = _content_hash(code)
+            yield 'test', {'name': test_name, 'code': code}
+    script = ''.join(chunks)
+    script_hash = _content_hash(script)
+    
+    domain = urlparse(url_data['url']).netloc.replace('.', '_')
+    filename = secure_filename(f"cypress_test_{domain}.js")
+    filepath = os.path.join(output_dir, filename)
+
+    # Lint the script with ESLint, unless it's the script linted last time
+    yield 'stage', {'stage': 'linting', 'progress': 80}
+    if previous is not None and previous['script_hash'] == script_hash and os.path.exists(filepath):
+        with open(filepath) as f:
+            script = f.read()
+    else:
+        script = lint_script(script)
+    
+    # Save the final script
+    yield 'stage', {'stage': 'writing', 'progress': 95}
+    if _write_if_changed(filepath, script):
+        written.append(filename)
+    
+    result = {
+        'script': script,
+        'page_object': page_script,
+        'fixture': fixture_data,
+        'filename': filename,
+        'page_filename': page_filename,
+        'fixture_filename': fixture_filename,
+        'element_count': len(url_data['elements']),
+        'page_title': url_data['page_title'],
+        'ai_enhanced': True,
+        'crawl': url_data.get('crawl', {})
+    }
+    fingerprint_store.set(url_data['url'], output_dir, {
+        'validators': validators,
+        'element_hash': element_hash,
+        'script_hash': script_hash,
+        'test_hashes': test_hashes,
+        'description': url_data['description'],
+        'links': page_links(url_data),
+        'result': result
+    })
+    if incremental:
+        old_tests = previous['test_hashes'] if previous is not None else {}
+        result = {**result, 'incremental': {
+            'status': 'regenerated' if previous is not None else 'new',
+            'reason': 'elements changed' if previous is not None else 'no previous run',
+            'tests': {
+                'reused': [name for name, digest in test_hashes.items() if old_tests.get(name) == digest],
+                'regenerated': [name for name, digest in test_hashes.items() if old_tests.get(name) != digest],
+                'removed': [name for name in old_tests if name not in test_hashes]
+            },
+            'files_written': written
+        }}
+    yield 'done', result
+
+def run_generation(url: str, incremental: bool = False, options: Optional[Dict[str, Any]] = None,
+                   progress=None) -> Dict[str, Any]:
+    """Crawl a URL and write its page object, fixture and linted Cypress script.
+
+    `progress(stage, percent)` is called as the pipeline moves between stages.
+    Raises GenerationError when the page can't be turned into tests.
+    """
+    report = progress or (lambda stage, percent: None)
+    for event, data in iter_generation(url, incremental, options):
+        if event == 'stage':
+            report(data['stage'], data['progress'])
+        elif event == 'done':
+            return data
+    raise GenerationError('Generation finished without a result', status=500)
+
+def write_page_artifacts(url_data: Dict[str, Any], output_dir: str, incremental: bool = False) -> Dict[str, Any]:
+    """Write a crawled page's artifacts into output_dir and return the generation result."""
+    for event, data in iter_page_artifacts(url_data, output_dir, incremental):
+        if event == 'done':
+            return data
+    raise GenerationError('Generation finished without a result', status=500)
+
+def _page_directory_name(url: str) -> str:
+    """A filesystem-safe, collision-free directory name for one page of a site crawl."""
+    parts = urlsplit(url)
+    slug = secure_filename(parts.path.strip('/').replace('/', '_'))[:60] or 'index'
+    return f"{slug}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
+
+def _site_page_record(directory: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    record = {
+        'page_title': result['page_title'],
+        'element_count': result['element_count'],
+        'directory': directory,
+        'spec': result['filename'],
+        'page_object': result['page_filename'],
+        'crawl': result.get('crawl', {})
+    }
+    if 'incremental' in result:
+        record['incremental'] = result['incremental']
+    return record
+
+def run_site_generation(url: str, max_depth: Optional[int] = None, max_pages: Optional[int] = None,
+                        incremental: bool = False, options: Optional[Dict[str, Any]] = None,
+                        progress=None) -> Dict[str, Any]:
+    """Crawl a site breadth-first and write a page object and spec for every page found.
+
+    Each page gets its own directory under site_<domain>/ so identically titled
+    pages don't overwrite each other, and a site_manifest.json lists every page
+    with its depth, the page that linked to it, its artifacts or its error.
+    With `incremental`, unchanged pages are reused and the manifest lists which
+    pages were reused and which were regenerated.
+    """
+    report = progress or (lambda stage, percent: None)
+    max_depth = app.config['SITE_MAX_DEPTH'] if max_depth is None else max_depth
+    max_pages = app.config['SITE_MAX_PAGES'] if max_pages is None else max_pages
+    site_dir = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(f"site_{urlparse(url).netloc.replace('.', '_')}"))
+    os.makedirs(site_dir, exist_ok=True)
+    finished = []
+    finished_lock = threading.Lock()
+
+    def page_done(page_url: str):
+        with finished_lock:
+            finished.append(page_url)
+            report('crawling', min(95, 5 + 90 * len(finished) // max(1, max_pages)))
+
+    def on_page(url_data: Dict[str, Any], depth: int) -> Dict[str, Any]:
+        if url_data['elements']:
+            directory = _page_directory_name(url_data['url'])
+            os.makedirs(os.path.join(site_dir, directory), exist_ok=True)
+            record = _site_page_record(directory, write_page_artifacts(url_data, os.path.join(site_dir, directory), incremental))
+        else:
+            record = {'page_title': url_data['page_title'], 'element_count': 0, 'error': 'No testable elements found'}
+        page_done(url_data['url'])
+        return record
+
+    def revalidate(page_url: str) -> Optional[Dict[str, Any]]:
+        directory = _page_directory_name(page_url)
+        previous = revalidate_page(page_url, os.path.join(site_dir, directory))
+        if previous is None:
+            return None
+        page_done(page_url)
+        return {'record': _site_page_record(directory, _reused_result(previous, 'not modified')), 'links': previous['links']}
+
+    report('crawling', 5)
+    started = time.time()
+    pages = crawl_engine.run(crawl_engine.crawl_site(url, max_depth, max_pages, on_page, revalidate if incremental else None, options))
+    generated = [page for page in pages if 'spec' in page]
+    if not generated:
+        errors = [page['error'] for page in pages if page.get('error')]
+        raise GenerationError('Failed to crawl website', errors[0] if errors else 'No pages could be crawled')
+
+    report('writing', 98)
+    manifest = {
+        'start_url': url,
+        'max_depth': max_depth,
+        'max_pages': max_pages,
+        'page_count': len(pages),
+        'generated_count': len(generated),
+        'elapsed_seconds': round(time.time() - started, 3),
+        'pages': pages
+    }
+    if incremental:
+        manifest['reused'] = [page['url'] for page in generated if page['incremental']['status'] == 'reused']
+        manifest['regenerated'] = [page['url'] for page in generated if page['incremental']['status'] != 'reused']
+    with open(os.path.join(site_dir, 'site_manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return {**manifest, 'directory': os.path.basename(site_dir), 'manifest_filename': 'site_manifest.json'}
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+
+def batch_process_count() -> int:
+    return app.config['BATCH_PROCESSES'] or os.cpu_count() or 1
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """The process pool batch generation fans extraction and script generation out to, created on first use.
+
+    Workers are spawned rather than forked: this process runs the crawl engine's
+    loop and Flask's threads, which a fork would copy mid-flight.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=batch_process_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _batch_pool
+
+def _discard_batch_pool(pool: ProcessPoolExecutor):
+    """Drop a pool whose worker died so the next batch starts a fresh one."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _shutdown_batch_pool():
+    if _batch_pool is not None:
+        _batch_pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_shutdown_batch_pool)
+
+def generate_batch_page(crawled: Dict[str, Any], output_dir: str, incremental: bool = False) -> Tuple[Dict[str, Any], int]:
+    """Extract a crawled page's elements and write its artifacts; runs in a batch worker process.
+
+    `crawled` is CrawlEngine.crawl's result with extract=False. Returns the
+    page's site-style record, or {'error', 'details'} when it has nothing to
+    test, and the milliseconds the work took in this process.
+    """
+    started = time.perf_counter()
+    extract = browser_page_data if crawled['extraction'] == 'browser' else extract_page_data
+    try:
+        url_data = extract(crawled['url'], crawled['content'], with_suggestions=False)
+        if not url_data['elements']:
+            raise GenerationError(
+                'No testable elements found',
+                'The page might be using client-side rendering or blocking crawlers'
+            )
+        url_data['validators'] = crawled['validators']
+        url_data['crawl'] = crawled['crawl']
+        os.makedirs(output_dir, exist_ok=True)
+        page = _site_page_record(os.path.basename(output_dir), write_page_artifacts(url_data, output_dir, incremental))
+    except GenerationError as e:
+        # Its details wouldn't survive pickling; send the client payload instead
+        page = e.to_dict()
+    return page, round((time.perf_counter() - started) * 1000)
+
+def run_batch_generation(urls: List[str], incremental: bool = False, options: Optional[Dict[str, Any]] = None,
+                         progress=None) -> Dict[str, Any]:
+    """Generate a page object and spec for every URL, crawling on the shared engine and generating in worker processes.
+
+    Pages load concurrently on the crawl engine; as each one arrives its
+    extraction, AI suggestions, script generation and lint run in the batch
+    process pool, so CPU-bound work isn't serialized behind the GIL. Every URL
+    gets its own directory under batch/<domain>/, and a batch_<id>.json
+    manifest lists per-URL records or errors with crawl and generation timings.
+    The aggregate timing compares the wall clock with the summed page load and
+    generation time a one-URL-at-a-time loop would have spent; time queued for
+    a crawl slot or spent revalidating is not counted as crawl time. Incremental
+    batches need FINGERPRINT_STORE_PATH set, since workers share it on disk.
+    """
+    report = progress or (lambda stage, percent: None)
+    batch_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'batch')
+    pool = get_batch_pool()
+    done = []
+
+    def page_dir(url: str) -> str:
+        domain = secure_filename(urlparse(url).netloc.replace('.', '_')) or 'unknown'
+        return os.path.join(domain, _page_directory_name(url))
+
+    async def generate(url: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        directory = page_dir(url)
+        output_dir = os.path.join(batch_dir, directory)
+        record: Dict[str, Any] = {'url': url}
+        timing = {'crawl_ms': 0, 'generate_ms': 0}
+        started = time.perf_counter()
+        try:
+            previous = await asyncio.to_thread(revalidate_page, url, output_dir) if incremental else None
+            if previous is not None:
+                record.update(_site_page_record(directory, _reused_result(previous, 'not modified')))
+                return record
+            crawled = await crawl_engine.crawl(url, with_suggestions=False, options=options, extract=False)
+            timing['crawl_ms'] = crawled.get('crawl', {}).get('load_ms', 0)
+            if 'error' in crawled:
+                record['error'] = crawled['error']
+                return record
+            page, timing['generate_ms'] = await loop.run_in_executor(pool, generate_batch_page, crawled, output_dir, incremental)
+            if 'error' not in page:
+                page['directory'] = directory
+            record.update(page)
+            return record
+        except BrokenProcessPool as e:
+            _discard_batch_pool(pool)
+            record['error'] = f'Batch worker process died: {str(e)}'
+            return record
+        except Exception as e:
+            record['error'] = str(e)
+            return record
+        finally:
+            record['timing'] = {**timing, 'total_ms': round((time.perf_counter() - started) * 1000)}
+            done.append(url)
+            report('generating', min(95, 5 + 90 * len(done) // len(urls)))
+
+    async def generate_all() -> List[Dict[str, Any]]:
+        return await asyncio.gather(*(generate(url) for url in urls))
+
+    report('crawling', 5)
+    started = time.perf_counter()
+    pages = crawl_engine.run(generate_all())
+    wall_ms = round((time.perf_counter() - started) * 1000)
+    crawl_ms = sum(page['timing']['crawl_ms'] for page in pages)
+    generate_ms = sum(page['timing']['generate_ms'] for page in pages)
+    generated = [page for page in pages if 'spec' in page]
+
+    report('writing', 98)
+    batch_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    manifest = {
+        'batch_id': batch_id,
+        'url_count': len(urls),
+        'generated_count': len(generated),
+        'failed_count': len(pages) - len(generated),
+        'timing': {
+            'wall_ms': wall_ms,
+            'crawl_ms': crawl_ms,
+            'generate_ms': generate_ms,
+            'sequential_ms': crawl_ms + generate_ms,
+            'speedup': round((crawl_ms + generate_ms) / wall_ms, 2) if wall_ms else None,
+            'processes': batch_process_count()
+        },
+        'pages': pages
+    }
+    if incremental:
+        manifest['reused'] = [page['url'] for page in generated if page['incremental']['status'] == 'reused']
+        manifest['regenerated'] = [page['url'] for page in generated if page['incremental']['status'] != 'reused']
+    os.makedirs(batch_dir, exist_ok=True)
+    manifest_filename = f'batch_{batch_id}.json'
+    with open(os.path.join(batch_dir, manifest_filename), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return {**manifest, 'directory': 'batch', 'manifest_filename': manifest_filename}
+
+class JobManager:
+    """Runs long generations on bounded in-process worker pools and tracks their progress.
+
+    Jobs run in one of two lanes with their own workers: 'short' for single pages
+    and 'long' for site and batch crawls, so long jobs can't starve short ones.
+    At most `max_active` jobs per lane may be queued or running at once; finished
+    jobs are kept for `ttl` seconds so clients can collect their results.
+    """
+
+    def __init__(self, workers: int, long_workers: int, max_active: int, ttl: float):
+        self.max_active = max_active
+        self.ttl = ttl
+        self._executors = {
+            'short': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job'),
+            'long': ThreadPoolExecutor(max_workers=max(1, long_workers), thread_name_prefix='long-job')
+        }
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, lane: str = 'short') -> Optional[str]:
+        """Queue fn(*args, progress=...) in a lane and return its job id, or None when the lane is at capacity."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            active = sum(1 for job in self._jobs.values() if job['lane'] == lane and job['status'] in ('queued', 'running'))
+            if active >= self.max_active:
+                return None
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'lane': lane,
+                'status': 'queued',
+                'stage': 'queued',
+                'progress': 0,
+                'created_at': now,
+                'updated_at': now,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+        self._executors[lane].submit(self._run, job_id, fn, args)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def _run(self, job_id: str, fn, args):
+        self._update(job_id, status='running', stage='starting', progress=1)
+        try:
+            result = fn(*args, progress=lambda stage, percent: self._update(job_id, stage=stage, progress=percent))
+        except GenerationError as e:
+            self._update(job_id, status='failed', stage='failed', error=e.to_dict(), finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status='failed', stage='failed', error={'error': str(e)}, finished_at=time.time())
+        else:
+            self._update(job_id, status='done', stage='done', progress=100, result=result, finished_at=time.time())
+
+    def _expire(self, now: float):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] is not None and now - job['finished_at'] > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+job_manager = JobManager(
+    workers=app.config['JOB_WORKERS'],
+    long_workers=app.config['JOB_LONG_WORKERS'],
+    max_active=app.config['JOB_MAX_ACTIVE'],
+    ttl=app.config['JOB_RESULT_TTL']
+)
+atexit.register(job_manager.shutdown)
+
+def _requested_url() -> str:
+    """Read and normalize the target URL from a generate request's JSON body."""
+    if not request.is_json:
+        raise GenerationError('Request must be JSON')
         
-        # Save the final script
-        domain = urlparse(url).netloc.replace('.', '_')
-        filename = secure_filename(f"cypress_test_{domain}.js")
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    data = request.get_json()
+    if not data:
+        raise GenerationError('Invalid JSON data')
         
-        with open(filepath, 'w') as f:
-            f.write(script)
+    url = data.get('url')
+    if not url:
+        raise GenerationError('URL is required')
         
-        return jsonify({
-            'script': script,
-            'page_object': page_script,
-            'fixture': fixture_data,
-            'filename': filename,
-            'page_filename': page_filename,
-            'fixture_filename': fixture_filename,
-            'element_count': len(url_data['elements']),
-            'page_title': url_data['page_title'],
-            'ai_enhanced': True
-        })
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def _requested_urls() -> List[str]:
+    """Read, normalize and de-duplicate the URL list of a batch request's JSON body."""
+    if not request.is_json:
+        raise GenerationError('Request must be JSON')
+
+    urls = (request.get_json() or {}).get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+        raise GenerationError('urls must be a non-empty list of URLs')
+    if len(urls) > app.config['BATCH_MAX_URLS']:
+        raise GenerationError('Too many URLs', f"A batch may have at most {app.config['BATCH_MAX_URLS']} URLs")
+
+    unique = {}
+    for url in urls:
+        url = url.strip()
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        unique.setdefault(normalize_url(url) or url, url)
+    return list(unique.values())
+
+_RESOURCE_POLICY_LISTS = ('block_types', 'block_hosts', 'allow_hosts')
+
+def _requested_crawl_options() -> Dict[str, Any]:
+    """Validate a generate request's per-request crawl overrides into crawl options.
+
+    "resource_policy" may set "enabled" and replace any of block_types,
+    block_hosts and allow_hosts for this crawl. "readiness" may pick a
+    strategy and set selector, quiet_ms, budget_ms and deadline_ms.
+    "extraction" picks where elements are extracted: 'html' or 'browser'.
+    """
+    options = {}
+    extraction = request.get_json().get('extraction')
+    if extraction is not None:
+        if extraction not in EXTRACTION_MODES:
+            raise GenerationError('Unknown extraction mode', f"Choose one of: {', '.join(EXTRACTION_MODES)}")
+        options['extraction'] = extraction
+    readiness = request.get_json().get('readiness')
+    if readiness is not None:
+        options['readiness'] = _validated_readiness(readiness)
+    policy = request.get_json().get('resource_policy')
+    if policy is None:
+        return options
+    if not isinstance(policy, dict):
+        raise GenerationError('resource_policy must be an object')
+    unknown = set(policy) - set(_RESOURCE_POLICY_LISTS) - {'enabled'}
+    if unknown:
+        raise GenerationError('Unknown resource_policy keys', ', '.join(sorted(unknown)))
+    if 'enabled' in policy and not isinstance(policy['enabled'], bool):
+        raise GenerationError('resource_policy.enabled must be a boolean')
+    for key in _RESOURCE_POLICY_LISTS:
+        if key in policy and not (isinstance(policy[key], list) and all(isinstance(v, str) for v in policy[key])):
+            raise GenerationError(f'resource_policy.{key} must be a list of strings')
+    options['resource_policy'] = policy
+    return options
+
+def _validated_readiness(readiness: Any) -> Dict[str, Any]:
+    if not isinstance(readiness, dict):
+        raise GenerationError('readiness must be an object')
+    unknown = set(readiness) - {'strategy', 'selector', 'quiet_ms', 'budget_ms', 'deadline_ms'}
+    if unknown:
+        raise GenerationError('Unknown readiness keys', ', '.join(sorted(unknown)))
+    strategy = readiness.get('strategy', app.config['READINESS_STRATEGY'])
+    if strategy not in READINESS_STRATEGIES:
+        raise GenerationError('Unknown readiness strategy', f"Choose one of: {', '.join(READINESS_STRATEGIES)}")
+    if strategy == 'selector' and not (isinstance(readiness.get('selector'), str) and readiness['selector'].strip()):
+        raise GenerationError('The selector readiness strategy needs a selector')
+    for key in ('quiet_ms', 'budget_ms', 'deadline_ms'):
+        value = readiness.get(key)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            raise GenerationError(f'readiness.{key} must be a non-negative integer')
+    return readiness
+
+@app.route('/api/generate', methods=['POST'])
+def generate_script():
+    try:
+        url = _requested_url()
+        incremental = bool(request.get_json().get('incremental'))
+        options = _requested_crawl_options()
+
+        # Job mode: return immediately and let the client poll /api/jobs/<id>
+        if request.get_json().get('async'):
+            job_id = job_manager.submit(run_generation, url, incremental, options)
+            if job_id is None:
+                return jsonify({
+                    'error': 'Too many generation jobs in progress',
+                    'details': 'Try again once a running job has finished'
+                }), 429
+            return jsonify({'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+            
+        return jsonify(run_generation(url, incremental, options))
         
+    except GenerationError as e:
+        return jsonify(e.to_dict()), e.status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def fix_common_linting_issues(script: str) -> str:
-    """Fix common ESLint issues in the generated script."""
-    fixes = {
-        'no-unused-vars': lambda s: re.sub(r'const\s+(\w+)\s*=\s*[^;]+;\s*(?!.*\1)', '', s),
-        'no-console': lambda s: re.sub(r'console\.log\([^)]+\);', '', s),
-        'semi': lambda s: re.sub(r'([^;])\n', r'\1;\n', s)
-    }
-    
-    for fix in fixes.values():
-        script = fix(script)
-    
-    return script
+@app.route('/api/generate/site', methods=['POST'])
+def generate_site_scripts():
+    """Crawl a whole site from the given URL; accepts max_depth, max_pages, incremental and async."""
+    try:
+        url = _requested_url()
+        data = request.get_json()
+        limits = {}
+        for key in ('max_depth', 'max_pages'):
+            value = data.get(key)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise GenerationError(f'{key} must be a non-negative integer')
+            limits[key] = value
+        incremental = bool(data.get('incremental'))
+        options = _requested_crawl_options()
+
+        if data.get('async'):
+            job_id = job_manager.submit(run_site_generation, url, limits['max_depth'], limits['max_pages'], incremental, options, lane='long')
+            if job_id is None:
+                return jsonify({
+                    'error': 'Too many generation jobs in progress',
+                    'details': 'Try again once a running job has finished'
+                }), 429
+            return jsonify({'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+
+        return jsonify(run_site_generation(url, limits['max_depth'], limits['max_pages'], incremental, options))
+
+    except GenerationError as e:
+        return jsonify(e.to_dict()), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/generate/batch', methods=['POST'])
+def generate_batch_scripts():
+    """Generate suites for a list of URLs at once; accepts urls, incremental and async."""
+    try:
+        urls = _requested_urls()
+        incremental = bool(request.get_json().get('incremental'))
+        options = _requested_crawl_options()
+
+        if request.get_json().get('async'):
+            job_id = job_manager.submit(run_batch_generation, urls, incremental, options, lane='long')
+            if job_id is None:
+                return jsonify({
+                    'error': 'Too many generation jobs in progress',
+                    'details': 'Try again once a running job has finished'
+                }), 429
+            return jsonify({'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+
+        return jsonify(run_batch_generation(urls, incremental, options))
+
+    except GenerationError as e:
+        return jsonify(e.to_dict()), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _format_stream_event(event: str, data: Any, sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+    return json.dumps({'event': event, 'data': data}, default=_json_default) + '\n'
+
+@app.route('/api/generate/stream', methods=['POST'])
+def generate_script_stream():
+    """Stream generation events as NDJSON, or as Server-Sent Events when the client accepts text/event-stream.
+
+    Failures after the stream has started arrive as a final 'error' event
+    carrying the usual error payload and its HTTP status.
+    """
+    try:
+        url = _requested_url()
+        options = _requested_crawl_options()
+    except GenerationError as e:
+        return jsonify(e.to_dict()), e.status
+    incremental = bool(request.get_json().get('incremental'))
+
+    sse = request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+
+    def events():
+        try:
+            for event, data in iter_generation(url, incremental, options):
+                yield _format_stream_event(event, data, sse)
+        except GenerationError as e:
+            yield _format_stream_event('error', {**e.to_dict(), 'status': e.status}, sse)
+        except Exception as e:
+            yield _format_stream_event('error', {'error': str(e), 'status': 500}, sse)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report a generation job's stage, progress and, once done, its artifacts."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'details': 'Unknown job id or the result has expired'}), 404
+    return jsonify(job)
+
+@app.route('/api/circuits', methods=['GET'])
+def get_circuits():
+    """Report per-host crawl circuit breaker state for hosts that have been failing."""
+    return jsonify({'hosts': crawl_engine.breaker.snapshot()})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Return hit/miss counters for the AI suggestion and crawl caches."""
+    return jsonify({
+        'suggestions': suggestion_cache.snapshot(),
+        'crawls': {**crawl_cache.snapshot(), 'coalesced': crawl_flight.coalesced}
+    })
 
 @app.route('/api/test_types', methods=['GET'])
 def get_test_types():
@@ -0,0 +1,54 @@
+// Resident ESLint worker used by app.py's LintWorker.
+// Reads one JSON request per line on stdin ({"id", "text", "filePath"}) and writes
+// one JSON response per line on stdout, so generated scripts are linted in memory
+// without paying Node startup and config resolution on every request.
+const path = require('path');
+const readline = require('readline');
+const { execSync } = require('child_process');
+
+function send(message) {
+  process.stdout.write(`${JSON.stringify(message)}\n`);
+}
+
+function loadESLint() {
+  try {
+    return require('eslint').ESLint;
+  } catch (localError) {
+    // Fall back to a globally installed eslint, as the `eslint` CLI would be
+    const globalRoot = execSync('npm root -g', { encoding: 'utf8' }).trim();
+    return require(path.join(globalRoot, 'eslint')).ESLint;
+  }
+}
+
+let eslint;
+try {
+  const ESLint = loadESLint();
+  eslint = new ESLint({ fix: true });
+} catch (err) {
+  send({ ready: false, error: err.message });
+  process.exit(0);
+}
+send({ ready: true });
+
+const rl = readline.createInterface({ input: process.stdin });
+let queue = Promise.resolve();
+
+rl.on('line', (line) => {
+  queue = queue.then(async () => {
+    let request;
+    try {
+      request = JSON.parse(line);
+      const [result] = await eslint.lintText(request.text, { filePath: request.filePath });
+      send({
+        id: request.id,
+        output: result.output === undefined ? request.text : result.output,
+        errorCount: result.errorCount,
+        messages: result.messages.map((m) => `${m.line}:${m.column} ${m.message} (${m.ruleId})`),
+      });
+    } catch (err) {
+      send({ id: request ? request.id : null, error: err.message });
+    }
+  });
+});
+
+rl.on('close', () => process.exit(0));